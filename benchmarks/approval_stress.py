@@ -0,0 +1,112 @@
+"""Hammer booking approvals and returns from many threads and check inventory invariants.
+
+Run from the project root::
+
+    python -m benchmarks.approval_stress --threads 16 --bookings 400 --copies 25
+
+Uses a throwaway SQLite file so real lock contention (and the retry path)
+is exercised. Exits non-zero if any invariant is violated:
+
+* ``0 <= copies_available <= copies_total``
+* ``copies_available + open approved loans == copies_total`` (a double
+  approval or double return would break this)
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+from datetime import date, timedelta
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--bookings", type=int, default=400)
+    parser.add_argument("--copies", type=int, default=25)
+    parser.add_argument("--books", type=int, default=4)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "stress.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    from library_app import create_app, db
+    from library_app.models import Book, Booking, User
+
+    app = create_app({"TESTING": True})
+    with app.app_context():
+        member = User(name="Stress Member", email="stress@example.com", role="member", approved=True)
+        member.set_password("password123")
+        db.session.add(member)
+        books = [
+            Book(title=f"Stress {n}", author="Bench", isbn=f"stress-{n}", copies_total=args.copies, copies_available=args.copies)
+            for n in range(args.books)
+        ]
+        db.session.add_all(books)
+        db.session.flush()
+        for n in range(args.bookings):
+            db.session.add(
+                Booking(
+                    user_id=member.id,
+                    book_id=books[n % args.books].id,
+                    start_date=date.today(),
+                    end_date=date.today() + timedelta(days=7),
+                    approved=False,
+                    returned=False,
+                    return_requested=False,
+                    fine_amount=0,
+                )
+            )
+        db.session.commit()
+        booking_ids = [booking_id for (booking_id,) in db.session.query(Booking.id)]
+
+    outcomes: dict[str, int] = {}
+    errors: list[BaseException] = []
+    lock = threading.Lock()
+
+    def worker(seed: int) -> None:
+        client = app.test_client()
+        client.post("/login", data={"email": "librarian@example.com", "password": "admin123"})
+        rng = random.Random(seed)
+        order = booking_ids[:]
+        rng.shuffle(order)
+        for booking_id in order:
+            # Mostly approvals, with some returns mixed in to free copies concurrently.
+            action = "return" if rng.random() < 0.2 else "approve"
+            try:
+                response = client.post(f"/bookings/{booking_id}/{action}")
+            except BaseException as exc:  # noqa: BLE001 - surface anything the app raised
+                with lock:
+                    errors.append(exc)
+                continue
+            with lock:
+                outcomes[f"{action} {response.status_code}"] = outcomes.get(f"{action} {response.status_code}", 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    failures = [f"request raised {exc!r}" for exc in errors]
+    with app.app_context():
+        for book in Book.query.all():
+            open_loans = Booking.query.filter_by(book_id=book.id, approved=True, returned=False).count()
+            if not 0 <= book.copies_available <= book.copies_total:
+                failures.append(f"{book.title}: copies_available={book.copies_available} out of range")
+            if book.copies_available + open_loans != book.copies_total:
+                failures.append(
+                    f"{book.title}: available {book.copies_available} + open loans {open_loans} "
+                    f"!= total {book.copies_total}"
+                )
+
+    print(f"outcomes: {outcomes}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("invariants hold" if not failures else f"{len(failures)} invariant violation(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""Catalog latency while a burst of logins hits the same process.
+
+Run from the project root::
+
+    python -m benchmarks.login_storm --logins 32 --seconds 5
+
+Starts ``--logins`` threads that sign in over and over while one reader
+thread keeps loading the member catalog, then prints the reader's p50/p95
+latency next to a baseline taken without the storm, and how the logins were
+answered (signed in, turned away as busy, throttled). Compare runs with
+different ``PASSWORD_VERIFY_WORKERS`` / ``PASSWORD_VERIFY_QUEUE`` values.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.routes import percentile
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32, help="Concurrent login threads.")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--workers", type=int, help="Override PASSWORD_VERIFY_WORKERS.")
+    parser.add_argument("--queue", type=int, help="Override PASSWORD_VERIFY_QUEUE.")
+    args = parser.parse_args()
+
+    from library_app import create_app
+    from library_app.seed import seed_database
+
+    overrides = {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'storm.db')}",
+        # Measure raw catalog work, not fragment cache hits.
+        "CATALOG_CACHE_TTL": 0,
+    }
+    if args.workers:
+        overrides["PASSWORD_VERIFY_WORKERS"] = args.workers
+    if args.queue:
+        overrides["PASSWORD_VERIFY_QUEUE"] = args.queue
+    app = create_app(overrides)
+    with app.app_context():
+        seed_database()
+
+    reader = app.test_client()
+    reader.post("/login", data={"email": "alice@example.com", "password": "password123"})
+
+    def read_catalog(stop: threading.Event) -> list[float]:
+        samples = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            reader.get("/member/books")
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    baseline_stop = threading.Event()
+    threading.Timer(min(args.seconds, 2.0), baseline_stop.set).start()
+    baseline = read_catalog(baseline_stop)
+
+    outcomes: dict[str, int] = {}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def storm() -> None:
+        client = app.test_client()
+        while not stop.is_set():
+            text = client.post(
+                "/login", data={"email": "bob@example.com", "password": "password123"}, follow_redirects=True
+            ).get_data(as_text=True)
+            if "Welcome back" in text:
+                outcome = "signed in"
+            elif "very busy" in text:
+                outcome = "busy"
+            elif "Too many" in text:
+                outcome = "throttled"
+            else:
+                outcome = "other"
+            client.get("/logout")
+            with lock:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    threads = [threading.Thread(target=storm) for _ in range(args.logins)]
+    for thread in threads:
+        thread.start()
+    threading.Timer(args.seconds, stop.set).start()
+    loaded = read_catalog(stop)
+    for thread in threads:
+        thread.join()
+
+    print(f"catalog baseline: p50 {percentile(baseline, 50):.1f} ms, p95 {percentile(baseline, 95):.1f} ms")
+    print(f"catalog in storm: p50 {percentile(loaded, 50):.1f} ms, p95 {percentile(loaded, 95):.1f} ms")
+    print(f"logins: {outcomes}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
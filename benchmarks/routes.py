@@ -0,0 +1,125 @@
+"""Latency and query-count benchmark for every route in ``routes.py``.
+
+Run from the project root::
+
+    python -m benchmarks.routes --scale 20000 --requests 50
+
+Builds a throwaway SQLite database with ``seed --scale``, signs in as the
+librarian and as the busiest member, then drives each route through the
+Flask test client and prints p50/p95/p99 latency plus the median number of
+SQL statements per request. Pass ``--database-url`` to benchmark an
+existing database instead.
+
+POST-only routes change state on every call, so they are listed as skipped
+rather than timed against a moving target.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event, func
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=20000, help="Books to generate (ignored with --database-url).")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per route.")
+    parser.add_argument("--database-url", help="Benchmark an existing database instead of generating one.")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'routes.db')}"
+
+    from library_app import create_app, db
+    from library_app.models import Book, Booking, User
+    from library_app.seed import seed_database, seed_scale
+
+    app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": database_url})
+    with app.app_context():
+        if not args.database_url:
+            seed_database()
+            seed_scale(args.scale)
+        member_id = (
+            db.session.query(Booking.user_id)
+            .join(User, User.id == Booking.user_id)
+            .filter(User.approved.is_(True), User.role == "member")
+            .group_by(Booking.user_id)
+            .order_by(func.count().desc())
+            .limit(1)
+            .scalar()
+        )
+        member = db.session.get(User, member_id)
+        member.set_password("password123")
+        db.session.commit()
+        member_email = member.email
+        sample = {
+            "book_id": db.session.query(func.min(Book.id)).scalar(),
+            "user_id": member_id,
+            "booking_id": db.session.query(func.min(Booking.id)).scalar(),
+            "kind": "bookings",
+        }
+        statement_count = {"n": 0}
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def count_statement(*_):
+            statement_count["n"] += 1
+
+    librarian = app.test_client()
+    librarian.post("/login", data={"email": "librarian@example.com", "password": "admin123"})
+    patron = app.test_client()
+    patron.post("/login", data={"email": member_email, "password": "password123"})
+    anonymous = app.test_client()
+
+    extra_args = {"library.search_books": "?q=vol", "library.member_search_books": "?q=vol"}
+    rows, skipped = [], []
+    with app.test_request_context():
+        from flask import url_for
+
+        for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+            if not rule.endpoint.startswith("library."):
+                continue
+            if "GET" not in rule.methods:
+                skipped.append(rule.rule)
+                continue
+            url = url_for(rule.endpoint, **{name: sample[name] for name in rule.arguments})
+            url += extra_args.get(rule.endpoint, "")
+            if rule.endpoint in ("library.login", "library.logout"):
+                client = anonymous  # logging out would end the signed-in sessions
+            elif rule.rule.startswith("/member"):
+                client = patron
+            else:
+                client = librarian
+
+            latencies, queries = [], []
+            for _ in range(args.requests):
+                statement_count["n"] = 0
+                started = time.perf_counter()
+                response = client.get(url)
+                # Drain and close streamed bodies here, so their request context is popped in order.
+                response.get_data()
+                response.close()
+                latencies.append((time.perf_counter() - started) * 1000)
+                queries.append(statement_count["n"])
+            rows.append((url, response.status_code, latencies, statistics.median(queries)))
+
+    print(f"{'route':<40} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for url, status, latencies, queries in rows:
+        print(
+            f"{url:<40} {status:>6} {percentile(latencies, 50):>8.2f} "
+            f"{percentile(latencies, 95):>8.2f} {percentile(latencies, 99):>8.2f} {queries:>8.0f}"
+        )
+    for rule in skipped:
+        print(f"{rule:<40} {'skipped (POST only)':>24}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Read throughput under concurrent writes: default Config vs the production profile.
+
+Run from the project root::
+
+    python -m benchmarks.sqlite_profile --seconds 5 --readers 8 --writers 2
+
+For each profile a fresh SQLite file is filled with a small catalog, then
+reader threads page through the catalog and dashboard counters while writer
+threads update copies and insert ratings. Reports reads/s, writes/s and how
+many operations failed with "database is locked".
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+
+def run_profile(profile: str, args) -> dict:
+    os.environ["LIBRARY_PROFILE"] = profile
+    workdir = tempfile.mkdtemp()
+    database_uri = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from library_app import create_app, db
+    from library_app.models import Book, Booking, Rating, User
+
+    app = create_app(
+        {"TESTING": True, "SQLALCHEMY_DATABASE_URI": database_uri, "CACHE_PATH": os.path.join(workdir, "cache.db")}
+    )
+    with app.app_context():
+        member = User.query.filter_by(role="librarian").first()
+        db.session.add_all(
+            Book(title=f"Bench {n}", author="Bench", isbn=f"bench-{n}", copies_total=5, copies_available=5)
+            for n in range(args.books)
+        )
+        db.session.commit()
+        member_id = member.id
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "read_locked": 0, "write_locked": 0}
+    lock = threading.Lock()
+
+    def bump(key: str) -> None:
+        with lock:
+            counts[key] += 1
+
+    def reader() -> None:
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    after = random.randint(0, args.books)
+                    Book.query.filter(Book.id > after).order_by(Book.id).limit(50).all()
+                    db.session.query(db.func.count(Booking.id)).filter_by(approved=False).scalar()
+                    db.session.rollback()
+                    bump("reads")
+                except OperationalError:
+                    db.session.rollback()
+                    bump("read_locked")
+
+    def writer() -> None:
+        with app.app_context():
+            while not stop.is_set():
+                try:
+                    book_id = random.randint(1, args.books)
+                    db.session.add(Rating(user_id=member_id, book_id=book_id, score=random.randint(1, 5)))
+                    Book.query.filter_by(id=book_id).update({Book.copies_available: Book.copies_available})
+                    db.session.commit()
+                    bump("writes")
+                except OperationalError:
+                    db.session.rollback()
+                    bump("write_locked")
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        db.engine.dispose()
+    return {
+        "reads/s": counts["reads"] / elapsed,
+        "writes/s": counts["writes"] / elapsed,
+        "read locked": counts["read_locked"],
+        "write locked": counts["write_locked"],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--books", type=int, default=2000)
+    args = parser.parse_args()
+
+    for profile in ("default", "production"):
+        result = run_profile(profile, args)
+        summary = ", ".join(
+            f"{key} {value:,.0f}" if isinstance(value, float) else f"{key} {value}" for key, value in result.items()
+        )
+        print(f"{profile:>10}: {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
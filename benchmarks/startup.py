@@ -0,0 +1,78 @@
+"""Import-plus-factory time, as paid by every worker spawn and ``flask`` CLI call.
+
+Run from the project root::
+
+    python -m benchmarks.startup --scale 50000 --runs 10
+
+Builds a throwaway database (or uses ``--database-url``), then starts fresh
+interpreters that import ``library_app`` and call ``create_app()``, and
+reports the median import and factory times for the normal boot (first-run
+marker present) and for a first boot (marker removed, so ``init_database``
+runs its DDL checks and librarian probe).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import library_app
+imported = time.perf_counter()
+library_app.create_app()
+print(json.dumps({"import": imported - started, "factory": time.perf_counter() - imported}))
+"""
+
+
+def boot(env: dict) -> dict:
+    output = subprocess.run([sys.executable, "-c", PROBE], env=env, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=50000, help="Books to generate (ignored with --database-url).")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--database-url", help="Boot against an existing database instead of generating one.")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    env = {**os.environ, "DATABASE_URL": database_url, "OVERDUE_SWEEP_INTERVAL": "0"}
+    env.pop("FLASK_RUN_FROM_CLI", None)
+    os.environ.update(env)
+
+    from library_app import create_app, init_marker
+    from library_app.seed import seed_database, seed_scale
+
+    app = create_app()
+    if not args.database_url:
+        with app.app_context():
+            seed_database()
+            seed_scale(args.scale)
+    marker = init_marker(app)
+
+    results = {}
+    for label, first_boot in (("normal boot", False), ("first boot", True)):
+        samples = []
+        for _ in range(args.runs):
+            if first_boot and os.path.exists(marker):
+                os.remove(marker)
+            samples.append(boot(env))
+        results[label] = samples
+    if not args.database_url and os.path.exists(marker):
+        os.remove(marker)
+
+    print(f"{'':<12} {'import ms':>10} {'factory ms':>11} {'total ms':>9}")
+    for label, samples in results.items():
+        imported = statistics.median(sample["import"] for sample in samples) * 1000
+        factory = statistics.median(sample["factory"] for sample in samples) * 1000
+        print(f"{label:<12} {imported:>10.1f} {factory:>11.1f} {imported + factory:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,51 +1,286 @@
+import hashlib
+import os
+import sys
+import time
+
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from .config import Config
+from sqlalchemy import event, inspect
+
+from .caching import Cache
+from .config import config_profiles
 
-# Initialize extensions
+# Initialize extensions. Flask-Migrate (and with it Alembic) is only loaded for `flask` CLI runs.
 db = SQLAlchemy()
-migrate = Migrate()
+cache = Cache()
+
+
+def _apply_sqlite_pragmas(app: Flask) -> None:
+    pragmas = app.config.get("SQLITE_PRAGMAS") or {}
+    engine = db.engine
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def init_marker(app: Flask) -> str:
+    """Path of the file recording that ``init_database`` ran against this database URI."""
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    return os.path.join(app.instance_path, f"initialized-{hashlib.sha1(uri.encode()).hexdigest()[:12]}")
+
+
+def cli_command() -> str | None:
+    """The ``flask`` subcommand being run, e.g. ``"db"`` for ``flask --app app db upgrade``."""
+    if os.environ.get("FLASK_RUN_FROM_CLI") != "true":
+        return None
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg in ("--app", "-A", "--env-file", "-e"):
+            next(args, None)
+        elif not arg.startswith("-"):
+            return arg
+    return None
+
+
+def migrations_own_schema(app: Flask) -> bool:
+    """Whether Alembic manages this database (it has an ``alembic_version`` table)."""
+    with app.app_context():
+        return inspect(db.engine).has_table("alembic_version")
+
+
+def init_database(app: Flask, create_tables: bool = True) -> None:
+    """Create missing tables and the FTS index, make sure a librarian exists, and leave the marker."""
+    from .models import User
+    from .search import install_fts
+
+    with app.app_context():
+        if create_tables:
+            db.create_all()
+        install_fts()
+
+        if not User.query.filter_by(role="librarian").first():
+            librarian = User(
+                name="Librarian",
+                email="librarian@example.com",
+                role="librarian",
+                approved=True,
+            )
+            librarian.set_password("admin123")
+            db.session.add(librarian)
+            db.session.commit()
+
+    if not app.testing:
+        os.makedirs(app.instance_path, exist_ok=True)
+        open(init_marker(app), "w").close()
 
 
 def create_app(test_config: dict | None = None) -> Flask:
     """Application factory."""
     app = Flask(__name__)
-    app.config.from_object(Config)
+    # LIBRARY_PROFILE=production turns on the WAL/pooling settings in ProductionConfig.
+    app.config.from_object(config_profiles[os.getenv("LIBRARY_PROFILE", "default")])
 
     if test_config:
         app.config.update(test_config)
 
     db.init_app(app)
-    migrate.init_app(app, db)
+    if os.environ.get("FLASK_RUN_FROM_CLI") == "true":
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
+    cache.init_app(app)
+    with app.app_context():
+        _apply_sqlite_pragmas(app)
+
+    from . import profiling
+    profiling.init_app(app)
 
     from . import routes  # noqa: WPS433
     app.register_blueprint(routes.bp)
 
+    from .api import api
+
+    app.register_blueprint(api)
+
     @app.cli.command("seed")
-    def seed_data() -> None:
+    @click.option("--scale", default=0, help="Also bulk-generate this many books plus matching members, loans and ratings.")
+    @click.option("--random-seed", default=0, help="Seed for the --scale generator.")
+    def seed_data(scale: int, random_seed: int) -> None:
         """Seed the database with sample data."""
-        from .seed import seed_database  # imported lazily so app is ready
+        from .events import backfill
+        from .leaderboards import rebuild
+        from .seed import seed_database, seed_scale  # imported lazily so app is ready
         seed_database()
+        if scale:
+            started = time.perf_counter()
+            totals = seed_scale(scale, random_seed)
+            summary = ", ".join(f"{count:,} {name}" for name, count in totals.items())
+            click.echo(f"Generated {summary} in {time.perf_counter() - started:.1f}s.")
+        # Seeded loans and ratings bypass the write paths that feed the event log and leaderboards.
+        backfill()
+        rebuild()
 
-    # Use app context so we can safely import models and query
-    with app.app_context():
-        # 👇 import here to avoid circular import
-        from .models import User
+    @app.cli.command("import-books")
+    @click.argument("path", type=click.Path(dir_okay=False, allow_dash=True))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+    @click.option("--batch-size", default=5000, show_default=True, help="Rows per upsert statement.")
+    def import_books_command(path: str, fmt: str | None, batch_size: int) -> None:
+        """Stream books from CSV or JSON Lines, upserting by ISBN."""
+        from . import search
+        from .importer import import_books, iter_records, open_source
 
-        # Optional if you're fully using migrations, but harmless:
-        db.create_all()
+        fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
 
-        # Ensure there is at least one default librarian
-        if not User.query.filter_by(role="librarian").first():
-            librarian = User(
-                name="Librarian",
-                email="librarian@example.com",
-                role="librarian",
-                approved=True,
+        def report(written: int, skipped: int, seconds: float) -> None:
+            click.echo(f"  {written:,} rows ({written / max(seconds, 1e-9):,.0f} rows/s), {skipped:,} skipped", err=True)
+
+        with open_source(path) as stream:
+            written, skipped, seconds = import_books(iter_records(stream, fmt), batch_size, report)
+        search.reset_index()
+        click.echo(f"Imported {written:,} books in {seconds:.1f}s ({written / max(seconds, 1e-9):,.0f} rows/s); {skipped:,} skipped.")
+
+    @app.cli.command("sweep-overdue")
+    def sweep_overdue_command() -> None:
+        """Accrue fines on every open overdue loan and record a summary."""
+        from .sweeps import sweep_overdue
+
+        started = time.perf_counter()
+        summary = sweep_overdue()
+        click.echo(
+            f"{summary.overdue_loans:,} overdue loans across {summary.members_affected:,} members, "
+            f"Rs {summary.outstanding_fines:,} accrued ({time.perf_counter() - started:.2f}s)."
+        )
+
+    @app.cli.command("build-recommendations")
+    @click.option("--top-k", default=8, show_default=True, help="Suggestions stored per member.")
+    @click.option("--changed-only", is_flag=True, help="Only rewrite members with loans or ratings since the last build.")
+    def build_recommendations_command(top_k: int, changed_only: bool) -> None:
+        """Precompute per-member book suggestions from loan and rating history."""
+        from .recommendations import build_recommendations, sparse
+
+        started = time.perf_counter()
+        written = build_recommendations(top_k, changed_only)
+        engine = "scipy.sparse" if sparse is not None else "pure Python"
+        click.echo(f"Recommendations written for {written:,} members in {time.perf_counter() - started:.1f}s ({engine}).")
+
+    @app.cli.command("compact-leaderboards")
+    @click.option("--all-time", is_flag=True, help="Also recount the all-time boards from every approved loan.")
+    @click.option("--rebuild", "from_history", is_flag=True, help="Recreate every board from loan and rating history.")
+    def compact_leaderboards_command(all_time: bool, from_history: bool) -> None:
+        """Rebuild the 7d/30d leaderboards from recent activity; optionally the all-time ones too."""
+        from .leaderboards import compact, rebuild, resync_all_time
+
+        started = time.perf_counter()
+        if from_history:
+            rebuild()
+        else:
+            compact()
+            if all_time:
+                resync_all_time()
+        click.echo(f"Leaderboards compacted in {time.perf_counter() - started:.2f}s.")
+
+    @app.cli.command("export")
+    @click.argument("kind", type=click.Choice(["bookings", "fines", "ratings"]))
+    @click.option("--output", "-o", default="-", type=click.Path(dir_okay=False, allow_dash=True), help="Defaults to stdout.")
+    @click.option("--format", "fmt", default="csv", type=click.Choice(["csv", "jsonl"]), show_default=True)
+    @click.option("--start", help="Earliest booking start date (rating date for ratings), YYYY-MM-DD.")
+    @click.option("--end", help="Latest booking start date (rating date for ratings), YYYY-MM-DD.")
+    @click.option("--status", type=click.Choice(["pending", "open", "overdue", "returned"]))
+    @click.option("--min-fine", help="Only bookings with at least this fine.")
+    def export_command(kind: str, output: str, fmt: str, start: str, end: str, status: str, min_fine: str) -> None:
+        """Stream bookings, fines or ratings as CSV or JSON Lines."""
+        import sys
+
+        from .exports import iter_export, parse_filters
+
+        try:
+            filters = parse_filters({"start": start, "end": end, "status": status, "min_fine": min_fine}, kind)
+        except ValueError as exc:
+            raise click.BadParameter(str(exc)) from exc
+        written = 0
+
+        def report(rows: int) -> None:
+            nonlocal written
+            written = rows
+
+        started = time.perf_counter()
+        stream = sys.stdout if output == "-" else open(output, "w", newline="", encoding="utf-8")
+        try:
+            for chunk in iter_export(kind, fmt, filters, report):
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        click.echo(f"Exported {written:,} {kind} rows in {time.perf_counter() - started:.1f}s.", err=True)
+
+    @app.cli.command("replay-events")
+    @click.option("--backfill", is_flag=True, help="First log the current state of bookings that have no events.")
+    @click.option("--apply", is_flag=True, help="Repair drifted bookings and copy counters (default: report only).")
+    @click.option("--batch-size", default=500, show_default=True, help="Bookings / books per transaction.")
+    def replay_events_command(backfill: bool, apply: bool, batch_size: int) -> None:
+        """Check booking state and copies_available against the circulation event log."""
+        from . import events
+
+        started = time.perf_counter()
+        if backfill:
+            click.echo(f"Logged {events.backfill(batch_size):,} bookings that predate the event log.")
+        report = events.replay(apply, batch_size)
+
+        def sample(ids: list[int]) -> str:
+            return f" (e.g. {', '.join(map(str, ids[:10]))})" if ids else ""
+
+        verb = "repaired" if apply else "drifted"
+        click.echo(f"Bookings: {report.bookings_checked:,} checked, {len(report.bookings_drifted):,} {verb}{sample(report.bookings_drifted)}.")
+        if report.bookings_unlogged:
+            click.echo(
+                f"  {report.bookings_unlogged:,} bookings have no events; run with --backfill "
+                "(copy counters are not repaired until the log is complete)."
             )
-            librarian.set_password("admin123")
-            db.session.add(librarian)
-            db.session.commit()
+        books_verb = "repaired" if apply and not report.bookings_unlogged else "drifted"
+        click.echo(f"Books: {report.books_checked:,} checked, {len(report.books_drifted):,} {books_verb}{sample(report.books_drifted)}.")
+        if report.books_skipped:
+            click.echo(f"  {len(report.books_skipped):,} changed during the replay and were left alone{sample(report.books_skipped)}.")
+        click.echo(f"Done in {time.perf_counter() - started:.1f}s.")
+
+    @app.cli.command("check-query-plans")
+    def check_query_plans_command() -> None:
+        """Fail if any hot query falls back to a table scan (SQLite only)."""
+        from .queryplans import check_query_plans
+
+        failed = False
+        for name, (plan, problems) in check_query_plans().items():
+            click.echo(f"{'FAIL' if problems else 'ok  '} {name}")
+            for step in plan:
+                click.echo(f"       {step}")
+            failed = failed or bool(problems)
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command("init-db")
+    def init_db_command() -> None:
+        """Create missing tables, the search index and the default librarian."""
+        init_database(app)
+        click.echo("Database initialised.")
+
+    # Schema setup runs once per database (then `flask init-db` / `flask db upgrade` own it),
+    # so worker spawns and CLI calls skip the DDL checks and the librarian probe. It never runs
+    # ahead of Alembic: not during `flask db ...`, and without create_all on a database Alembic
+    # manages, where tables from newer models would make `db upgrade` fail with "already exists".
+    if app.testing:
+        init_database(app)
+    elif app.config.get("AUTO_INIT_DB", True) and not os.path.exists(init_marker(app)) and cli_command() != "db":
+        init_database(app, create_tables=not migrations_own_schema(app))
+
+    if not app.testing:
+        from . import leaderboards, sweeps
+        sweeps.start_scheduler(app)
+        leaderboards.start_scheduler(app)
 
     return app
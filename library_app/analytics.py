@@ -0,0 +1,222 @@
+"""Circulation analytics computed over column arrays.
+
+Loans and books are read with plain column SELECTs, a batch at a time, into
+compact ``array.array`` columns (dates as day ordinals, NULLs as 0), so even
+a few million loans cost a handful of machine words each and no ORM objects.
+When numpy is installed the arrays are wrapped without copying and every
+aggregate (daily counts, grouped sums, means) is a vectorised ``bincount`` /
+mask expression; without it the same aggregates run as single passes over
+the arrays.
+
+``circulation_stats`` returns plain data for the ``/admin/analytics`` page
+and its JSON feed, cached for ``ANALYTICS_CACHE_TTL`` seconds.
+"""
+from array import array
+from collections import defaultdict
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import select
+
+from . import cache, db
+from .models import Book, Booking, Category, User
+
+try:
+    import numpy as np
+except ImportError:  # optional: fall back to plain passes over the arrays
+    np = None
+
+LOAD_BATCH = 10_000
+TOP_MEMBERS = 10
+
+
+def load_columns(query, typecodes: dict[str, str]) -> dict[str, array]:
+    """Stream ``query`` into one typed array per column; dates become ordinals and NULLs 0."""
+    columns = {name: array(code) for name, code in typecodes.items()}
+    targets = list(columns.values())
+    result = db.session.execute(query.execution_options(yield_per=LOAD_BATCH))
+    for batch in result.partitions():
+        for row in batch:
+            for target, value in zip(targets, row):
+                if value is None:
+                    value = 0
+                elif isinstance(value, date):
+                    value = value.toordinal()
+                target.append(value)
+    return columns
+
+
+def _vector(column: array):
+    return np.frombuffer(column, dtype=np.dtype(column.typecode)) if len(column) else np.zeros(0, dtype=np.int64)
+
+
+def count_by_offset(values: array, first: int, span: int) -> list[int]:
+    """How many ``values`` fall on each of ``first .. first + span - 1``."""
+    if np is not None:
+        offsets = _vector(values).astype(np.int64) - first
+        offsets = offsets[(offsets >= 0) & (offsets < span)]
+        return np.bincount(offsets, minlength=span).tolist()
+    counts = [0] * span
+    for value in values:
+        if 0 <= value - first < span:
+            counts[value - first] += 1
+    return counts
+
+
+def group_sum(keys: array, values: array) -> dict[int, int]:
+    """Sum ``values`` per distinct key."""
+    if np is not None:
+        if not len(keys):
+            return {}
+        distinct, inverse = np.unique(_vector(keys), return_inverse=True)
+        sums = np.bincount(inverse, weights=_vector(values))
+        return {int(key): int(total) for key, total in zip(distinct, sums)}
+    totals: dict[int, int] = defaultdict(int)
+    for key, value in zip(keys, values):
+        totals[key] += value
+    return dict(totals)
+
+
+def group_count(keys: array) -> dict[int, int]:
+    if np is not None:
+        distinct, counts = np.unique(_vector(keys), return_counts=True)
+        return {int(key): int(count) for key, count in zip(distinct, counts)}
+    counts: dict[int, int] = defaultdict(int)
+    for key in keys:
+        counts[key] += 1
+    return dict(counts)
+
+
+def loan_metrics(loans: dict[str, array], today: int) -> dict:
+    """Average loan length, late and overdue counts over approved loans."""
+    if np is not None:
+        start, end = _vector(loans["start"]), _vector(loans["end"])
+        returned_at, returned = _vector(loans["returned_at"]), _vector(loans["returned"]).astype(bool)
+        lengths = (returned_at - start)[returned]
+        overdue = ~returned & (end < today)
+        late = returned & (returned_at > end)
+        return {
+            "loans": int(len(start)),
+            "returned": int(returned.sum()),
+            "average_loan_days": round(float(lengths.mean()), 1) if len(lengths) else 0.0,
+            "currently_overdue": int(overdue.sum()),
+            "returned_late": int(late.sum()),
+        }
+    returned_count = overdue = late = total_days = 0
+    for start, end, returned_at, returned in zip(loans["start"], loans["end"], loans["returned_at"], loans["returned"]):
+        if returned:
+            returned_count += 1
+            total_days += returned_at - start
+            late += returned_at > end
+        else:
+            overdue += end < today
+    return {
+        "loans": len(loans["start"]),
+        "returned": returned_count,
+        "average_loan_days": round(total_days / returned_count, 1) if returned_count else 0.0,
+        "currently_overdue": overdue,
+        "returned_late": late,
+    }
+
+
+def _names(model, label, ids) -> dict[int, str]:
+    if not ids:
+        return {}
+    return dict(db.session.execute(select(model.id, label).where(model.id.in_(ids))).all())
+
+
+def compute_stats(days: int, today: date | None = None) -> dict:
+    today = today or date.today()
+    since = today - timedelta(days=days - 1) if days else None
+
+    loans_query = (
+        select(
+            Booking.start_date,
+            Booking.end_date,
+            Booking.returned_at,
+            Booking.returned,
+            Booking.fine_amount,
+            Booking.user_id,
+            Book.category_id,
+        )
+        .join(Book, Book.id == Booking.book_id)
+        .where(Booking.approved.is_(True))
+    )
+    if since:
+        loans_query = loans_query.where(Booking.start_date >= since)
+    loans = load_columns(
+        loans_query,
+        {"start": "l", "end": "l", "returned_at": "l", "returned": "b", "fine": "l", "user_id": "l", "category_id": "l"},
+    )
+    books = load_columns(
+        select(Book.category_id, Book.copies_total, Book.copies_available),
+        {"category_id": "l", "copies_total": "l", "copies_available": "l"},
+    )
+
+    metrics = loan_metrics(loans, today.toordinal())
+    metrics["overdue_rate"] = (
+        round((metrics["currently_overdue"] + metrics["returned_late"]) / metrics["loans"], 3) if metrics["loans"] else 0.0
+    )
+
+    # Daily series: the whole window, or the last 90 days of an all-time report.
+    span = days or 90
+    first = today.toordinal() - span + 1
+    per_day = count_by_offset(loans["start"], first, span)
+
+    fines_by_member = group_sum(loans["user_id"], loans["fine"])
+    top_members = sorted(
+        ((user_id, total) for user_id, total in fines_by_member.items() if total > 0), key=lambda pair: -pair[1]
+    )[:TOP_MEMBERS]
+    member_names = _names(User, User.name, [user_id for user_id, _ in top_members])
+
+    fines_by_category = group_sum(loans["category_id"], loans["fine"])
+    loans_by_category = group_count(loans["category_id"])
+    copies_by_category = group_sum(books["category_id"], books["copies_total"])
+    free_by_category = group_sum(books["category_id"], books["copies_available"])
+    out_by_category = {key: total - free_by_category.get(key, 0) for key, total in copies_by_category.items()}
+    category_ids = sorted(set(copies_by_category) | set(loans_by_category))
+    category_names = _names(Category, Category.name, [category_id for category_id in category_ids if category_id])
+
+    total_copies = sum(copies_by_category.values())
+    copies_out = sum(out_by_category.values())
+    return {
+        "as_of": today.isoformat(),
+        "days": days,
+        **metrics,
+        "fines_total": sum(fines_by_member.values()),
+        "copies_total": total_copies,
+        "copies_out": copies_out,
+        "utilization": round(copies_out / total_copies, 3) if total_copies else 0.0,
+        "loans_per_day": [
+            {"day": date.fromordinal(first + offset).isoformat(), "loans": count} for offset, count in enumerate(per_day)
+        ],
+        "fines_by_member": [
+            {"user_id": user_id, "name": member_names.get(user_id, "Deleted user"), "fines": total}
+            for user_id, total in top_members
+        ],
+        "categories": [
+            {
+                "category_id": category_id or None,
+                "name": category_names.get(category_id, "Uncategorized"),
+                "loans": loans_by_category.get(category_id, 0),
+                "fines": fines_by_category.get(category_id, 0),
+                "copies_total": copies_by_category.get(category_id, 0),
+                "copies_out": out_by_category.get(category_id, 0),
+                "utilization": (
+                    round(out_by_category.get(category_id, 0) / copies_by_category[category_id], 3)
+                    if copies_by_category.get(category_id)
+                    else 0.0
+                ),
+            }
+            for category_id in category_ids
+        ],
+    }
+
+
+def circulation_stats(days: int) -> dict:
+    key = f"analytics:{days}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(days)
+        cache.set(key, stats, current_app.config.get("ANALYTICS_CACHE_TTL", 0))
+    return stats
@@ -0,0 +1,232 @@
+"""Versioned JSON API for kiosks and mobile clients.
+
+Read-only endpoints under ``/api/v1`` for books, categories, bookings and
+ratings, authenticated with the same session cookie as the HTML portals.
+Collections use the keyset cursors from ``routes.paginate`` (``?after=``,
+``?limit=``) and accept sparse fieldsets (``?fields=title,author``).
+
+Every response carries a strong ``ETag``; single resources also carry a
+``Last-Modified`` from ``updated_at``. Collections build their ETag from one
+aggregate query (``COUNT``/``MAX(updated_at)``/``MAX(id)``) run before the
+page is loaded, so a client polling an unchanged catalog gets ``304 Not
+Modified`` without any rows being fetched or serialized. They send no
+``Last-Modified``, because deleting an older row leaves ``MAX(updated_at)``
+unchanged.
+"""
+import hashlib
+from datetime import date, datetime, timezone
+
+from flask import Blueprint, Response, abort, jsonify, request, session, url_for
+from sqlalchemy import func
+from werkzeug.exceptions import HTTPException
+
+from . import db
+from .models import Book, Booking, Category, Rating
+from .routes import current_access, paginate
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+MAX_LIMIT = 200
+
+# Fields each resource exposes; ``?fields=`` picks a subset, ``id`` is always included.
+BOOK_FIELDS = {
+    "title": lambda book: book.title,
+    "author": lambda book: book.author,
+    "isbn": lambda book: book.isbn,
+    "description": lambda book: book.description,
+    "category_id": lambda book: book.category_id,
+    "copies_total": lambda book: book.copies_total,
+    "copies_available": lambda book: book.copies_available,
+    "rating_count": lambda book: book.rating_count,
+    "average_rating": lambda book: book.average_rating(),
+    "updated_at": lambda book: book.updated_at,
+}
+CATEGORY_FIELDS = {
+    "name": lambda category: category.name,
+}
+BOOKING_FIELDS = {
+    "book_id": lambda booking: booking.book_id,
+    "user_id": lambda booking: booking.user_id,
+    "start_date": lambda booking: booking.start_date,
+    "end_date": lambda booking: booking.end_date,
+    "approved": lambda booking: bool(booking.approved),
+    "return_requested": lambda booking: bool(booking.return_requested),
+    "returned": lambda booking: bool(booking.returned),
+    "returned_at": lambda booking: booking.returned_at,
+    "fine_amount": lambda booking: booking.fine_amount or 0,
+    "updated_at": lambda booking: booking.updated_at,
+}
+RATING_FIELDS = {
+    "book_id": lambda rating: rating.book_id,
+    "user_id": lambda rating: rating.user_id,
+    "score": lambda rating: rating.score,
+    "comment": lambda rating: rating.comment,
+    "created_at": lambda rating: rating.created_at,
+    "updated_at": lambda rating: rating.updated_at,
+}
+
+
+@api.errorhandler(HTTPException)
+def json_error(exc: HTTPException):
+    return jsonify({"error": exc.name, "message": exc.description}), exc.code
+
+
+def require_access() -> tuple[str, int]:
+    """Return ``(role, user_id)`` for the session, or abort with a JSON 401/403."""
+    access = current_access()
+    if not access:
+        abort(401, "Sign in first.")
+    if not access[1]:
+        abort(403, "Your account is awaiting librarian approval.")
+    return access[0], session["user_id"]
+
+
+def selected_fields(available: dict) -> dict:
+    requested = request.args.get("fields")
+    if not requested:
+        return available
+    names = [name.strip() for name in requested.split(",") if name.strip() and name.strip() != "id"]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}.")
+    return {name: available[name] for name in names}
+
+
+def page_limit() -> int:
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        abort(400, "limit must be an integer.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def to_json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def serialize(item, fields: dict) -> dict:
+    return {"id": item.id, **{name: to_json_value(getter(item)) for name, getter in fields.items()}}
+
+
+def validators(*parts) -> tuple[str, datetime | None]:
+    """Strong ETag for ``parts`` plus the newest ``updated_at`` among them, if any."""
+    digest = hashlib.sha1(repr((request.full_path, session.get("user_id"), parts)).encode()).hexdigest()
+    modified = max((part for part in parts if isinstance(part, datetime)), default=None)
+    return digest, modified
+
+
+def not_modified(etag: str, last_modified: datetime | None) -> bool:
+    # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 13.2.2).
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified and request.if_modified_since:
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    return False
+
+
+def conditional(etag: str, last_modified: datetime | None, build) -> Response:
+    """Answer 304 when the client's copy is current, otherwise call ``build()`` for the body."""
+    response = Response(status=304) if not_modified(etag, last_modified) else jsonify(build())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # Bookings and ratings depend on who is signed in.
+    response.vary.add("Cookie")
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def collection(query, model, fields: dict, endpoint: str, sort_column=None, descending: bool = False) -> Response:
+    count, newest, top_id = query.with_entities(
+        func.count(model.id), func.max(model.updated_at), func.max(model.id)
+    ).order_by(None).one()
+    etag, _ = validators(count, newest, top_id)
+
+    def build() -> dict:
+        page = paginate(query, model, sort_column, descending, per_page=page_limit())
+        args = {key: value for key, value in request.args.items() if key != "after"}
+        return {
+            "data": [serialize(item, fields) for item in page.items],
+            "next": url_for(endpoint, after=page.next_cursor, **args) if page.next_cursor else None,
+        }
+
+    # ETag only; see the module docstring.
+    return conditional(etag, None, build)
+
+
+def resource(item, fields: dict) -> Response:
+    updated_at = getattr(item, "updated_at", None)
+    etag, last_modified = validators(item.id, updated_at)
+    return conditional(etag, last_modified, lambda: serialize(item, fields))
+
+
+@api.route("/books")
+def books():
+    require_access()
+    fields = selected_fields(BOOK_FIELDS)
+    query = Book.query
+    category_id = request.args.get("category", type=int)
+    if category_id:
+        query = query.filter(Book.category_id == category_id)
+    return collection(query, Book, fields, "api.books")
+
+
+@api.route("/books/<int:book_id>")
+def book_detail(book_id: int):
+    require_access()
+    return resource(db.get_or_404(Book, book_id), selected_fields(BOOK_FIELDS))
+
+
+@api.route("/categories")
+def categories():
+    require_access()
+    fields = selected_fields(CATEGORY_FIELDS)
+    # Categories carry no timestamps, but the table is tiny: validate on its (id, name) pairs.
+    rows = db.session.query(Category.id, Category.name).order_by(Category.id).all()
+    etag, _ = validators(tuple(rows))
+    return conditional(etag, None, lambda: {"data": [serialize(row, fields) for row in rows]})
+
+
+@api.route("/bookings")
+def bookings():
+    role, user_id = require_access()
+    fields = selected_fields(BOOKING_FIELDS)
+    query = Booking.query
+    if role != "librarian":
+        query = query.filter(Booking.user_id == user_id)
+    book_id = request.args.get("book", type=int)
+    if book_id:
+        query = query.filter(Booking.book_id == book_id)
+    return collection(query, Booking, fields, "api.bookings", Booking.start_date, descending=True)
+
+
+@api.route("/bookings/<int:booking_id>")
+def booking_detail(booking_id: int):
+    role, user_id = require_access()
+    booking = db.get_or_404(Booking, booking_id)
+    if role != "librarian" and booking.user_id != user_id:
+        abort(404)
+    return resource(booking, selected_fields(BOOKING_FIELDS))
+
+
+@api.route("/ratings")
+def ratings():
+    role, user_id = require_access()
+    fields = selected_fields(RATING_FIELDS)
+    query = Rating.query
+    book_id = request.args.get("book", type=int)
+    if book_id:
+        # Reviews of one book are public to every signed-in reader, as on the HTML reviews page.
+        query = query.filter(Rating.book_id == book_id)
+    elif role != "librarian":
+        query = query.filter(Rating.user_id == user_id)
+    return collection(query, Rating, fields, "api.ratings", Rating.created_at, descending=True)
+
+
+@api.route("/ratings/<int:rating_id>")
+def rating_detail(rating_id: int):
+    require_access()
+    return resource(db.get_or_404(Rating, rating_id), selected_fields(RATING_FIELDS))
@@ -0,0 +1,64 @@
+"""Per-book availability over date ranges.
+
+An approved, unreturned loan holds one copy from its ``start_date`` through
+its ``end_date``, or through today if it is overdue and still out. Only the
+loans that overlap the window are read, via one seek on the
+``(book_id, start_date, end_date)`` index, and a sweep over their start/end
+boundaries gives the number of copies held on every day of the window.
+
+The calendar is a forecast of when copies come back. It does not gate
+bookings: approval takes a copy off the shelf at once, whatever the loan's
+dates (``inventory.reserve_copy``). Every booking path therefore checks
+``copies_available``, and members who find none join the waitlist.
+"""
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import NamedTuple
+
+from sqlalchemy import select, true
+
+from . import db
+from .models import Book, Booking
+
+
+class Day(NamedTuple):
+    day: date
+    held: int
+    free: int
+
+
+def held_intervals(book_id: int, start: date, end: date) -> list[tuple[date, date]]:
+    """``(start, end)`` of every loan holding a copy of ``book_id`` at some point in ``[start, end]``."""
+    today = date.today()
+    # An overdue loan still out holds its copy through today, whatever its end_date says.
+    reaches_window = true() if start <= today else Booking.end_date >= start
+    rows = db.session.execute(
+        select(Booking.start_date, Booking.end_date).where(
+            Booking.book_id == book_id,
+            Booking.start_date <= end,
+            reaches_window,
+            Booking.approved.is_(True),
+            Booking.returned.is_not(True),
+        )
+    )
+    return [(loan_start, max(loan_end, today)) for loan_start, loan_end in rows]
+
+
+def daily_holds(intervals: list[tuple[date, date]], start: date, end: date) -> list[int]:
+    """Copies held on each day of ``[start, end]``: a sweep over the clipped interval boundaries."""
+    span = (end - start).days + 1
+    deltas = [0] * (span + 1)
+    for loan_start, loan_end in intervals:
+        first = max((loan_start - start).days, 0)
+        last = min((loan_end - start).days, span - 1)
+        if first <= last:
+            deltas[first] += 1
+            deltas[last + 1] -= 1
+    return list(accumulate(deltas[:span]))
+
+
+def calendar(book: Book, start: date, days: int) -> list[Day]:
+    end = start + timedelta(days=days - 1)
+    held = daily_holds(held_intervals(book.id, start, end), start, end)
+    total = book.copies_total or 0
+    return [Day(start + timedelta(days=offset), count, max(total - count, 0)) for offset, count in enumerate(held)]
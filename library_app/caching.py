@@ -0,0 +1,243 @@
+"""Small pluggable cache used for dashboard counts, catalog fragments and user lookups.
+
+``Cache`` is a Flask extension in the same mould as ``db``:
+``cache.init_app(app)`` picks a backend from ``CACHE_BACKEND``.
+
+* ``memory``: a thread-safe LRU inside each process (the default).
+* ``sqlite``: one file at ``CACHE_PATH`` shared by every worker on the host,
+  so an invalidation in one gunicorn worker is seen by all of them.
+
+Both backends share one interface: ``get``/``set``/``delete``, per-entry TTL,
+tags that can be invalidated together, and a cap on the number of entries.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from flask import Flask, current_app
+
+log = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def invalidate_tag(self, tag: str) -> None: ...
+
+    @abstractmethod
+    def clear(self) -> None: ...
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU; values are stored as-is, so callers must not mutate what they get back."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # key -> (expires_at, value, tags)
+        self.entries: OrderedDict[str, tuple[float, Any, tuple[str, ...]]] = OrderedDict()
+        self.tags: dict[str, set[str]] = {}
+
+    def get(self, key: str) -> Any | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        tags = tuple(tags)
+        with self.lock:
+            self._drop(key)
+            self.entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self._drop(key)
+
+    def invalidate_tag(self, tag: str) -> None:
+        with self.lock:
+            for key in self.tags.pop(tag, set()):
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+
+    def _drop(self, key: str) -> None:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class SQLiteCache(CacheBackend):
+    """Cache shared across processes through one SQLite file.
+
+    Values are pickled. Expiry uses wall-clock time because several processes
+    compare it. Reads don't write, so over the cap the oldest *written*
+    entries go first rather than the least recently read. Any SQLite error is
+    logged and treated as a miss; the cache must never take a request down.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS cache_entries ("
+        " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, stored_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_cache_entries_stored_at ON cache_entries (stored_at)",
+        "CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))",
+        "CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key)",
+    )
+    # Expired and over-cap entries are pruned on every Nth write from a process.
+    PRUNE_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.local = threading.local()
+        self.writes = 0
+        with self._connect() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, reopened after a fork (e.g. gunicorn --preload).
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key: str) -> Any | None:
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            return pickle.loads(row[0]) if row else None
+        except (sqlite3.Error, pickle.PickleError) as exc:
+            log.warning("cache get %s failed: %s", key, exc)
+            return None
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        now = time.time()
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, stored_at) VALUES (?, ?, ?, ?)",
+                    (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + ttl, now),
+                )
+                conn.execute("DELETE FROM cache_tags WHERE key = ?", (key,))
+                conn.executemany("INSERT INTO cache_tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags])
+            self.writes += 1
+            if self.writes % self.PRUNE_EVERY == 0:
+                self.prune()
+        except sqlite3.Error as exc:
+            log.warning("cache set %s failed: %s", key, exc)
+
+    def delete(self, key: str) -> None:
+        self._write(
+            ("DELETE FROM cache_entries WHERE key = ?", (key,)),
+            ("DELETE FROM cache_tags WHERE key = ?", (key,)),
+        )
+
+    def invalidate_tag(self, tag: str) -> None:
+        self._write(
+            ("DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_tags WHERE tag = ?)", (tag,)),
+            ("DELETE FROM cache_tags WHERE tag = ?", (tag,)),
+        )
+
+    def clear(self) -> None:
+        self._write(("DELETE FROM cache_entries", ()), ("DELETE FROM cache_tags", ()))
+
+    def prune(self) -> None:
+        self._write(
+            ("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),)),
+            (
+                "DELETE FROM cache_entries WHERE key IN ("
+                " SELECT key FROM cache_entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ),
+            ("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)", ()),
+        )
+
+    def _write(self, *statements: tuple[str, tuple]) -> None:
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for sql, params in statements:
+                    conn.execute(sql, params)
+        except sqlite3.Error as exc:
+            # The entry's TTL still bounds how long a missed invalidation can serve stale data.
+            log.error("cache write failed: %s", exc)
+
+
+BACKENDS = {
+    "memory": lambda config: MemoryCache(config.get("CACHE_MAX_ENTRIES", 2048)),
+    "sqlite": lambda config: SQLiteCache(config["CACHE_PATH"], config.get("CACHE_MAX_ENTRIES", 2048)),
+}
+
+
+class Cache:
+    """Flask extension; the backend lives in ``app.extensions["cache"]``."""
+
+    def __init__(self, app: Flask | None = None) -> None:
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        name = app.config.get("CACHE_BACKEND", "memory")
+        if name not in BACKENDS:
+            raise RuntimeError(f"Unknown CACHE_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+        app.extensions["cache"] = BACKENDS[name](app.config)
+
+    @property
+    def backend(self) -> CacheBackend:
+        return current_app.extensions["cache"]
+
+    def get(self, key: str) -> Any | None:
+        return self.backend.get(key)
+
+    def set(self, key: str, value: Any, ttl: float, tags: Iterable[str] = ()) -> None:
+        if ttl > 0:
+            self.backend.set(key, value, ttl, tags)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def invalidate_tag(self, tag: str) -> None:
+        self.backend.invalidate_tag(tag)
+
+    def clear(self) -> None:
+        self.backend.clear()
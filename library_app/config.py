@@ -11,3 +11,76 @@ class Config:
         f"sqlite:///{BASE_DIR / 'library.db'}",
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Run `flask init-db` automatically the first time the app starts against a database.
+    AUTO_INIT_DB = os.getenv("AUTO_INIT_DB", "1") == "1"
+    # Seconds to trust a cached (role, approved) pair before re-reading the user; 0 disables.
+    USER_ACCESS_CACHE_TTL = int(os.getenv("USER_ACCESS_CACHE_TTL", "30"))
+    # Seconds the librarian dashboard snapshot may be served without re-querying; 0 disables.
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "10"))
+    # Seconds a rendered catalog grid may be reused; local writes invalidate it at once. 0 disables.
+    CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "30"))
+    # "memory" (per-process LRU) or "sqlite" (one file at CACHE_PATH shared by all workers).
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_PATH = os.getenv("CACHE_PATH", str(BASE_DIR / "library-cache.db"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2048"))
+    # Retries (with jittered exponential backoff from DB_LOCK_BACKOFF seconds) on "database is locked".
+    DB_LOCK_RETRIES = int(os.getenv("DB_LOCK_RETRIES", "5"))
+    DB_LOCK_BACKOFF = float(os.getenv("DB_LOCK_BACKOFF", "0.05"))
+    # werkzeug method for new and re-hashed passwords, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+    # Members whose stored hash uses other parameters are re-hashed when they next sign in.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    # Threads per process that hash passwords, and how many logins may hold or wait for one
+    # before further logins are turned away with "try again".
+    PASSWORD_VERIFY_WORKERS = int(os.getenv("PASSWORD_VERIFY_WORKERS", "2"))
+    PASSWORD_VERIFY_QUEUE = int(os.getenv("PASSWORD_VERIFY_QUEUE", "32"))
+    # Failed sign-ins per email within the window (seconds) before that email is refused; 0 disables.
+    LOGIN_FAILURE_LIMIT = int(os.getenv("LOGIN_FAILURE_LIMIT", "5"))
+    LOGIN_FAILURE_WINDOW = int(os.getenv("LOGIN_FAILURE_WINDOW", "900"))
+    # Seconds between in-process overdue sweeps; 0 leaves it to `flask sweep-overdue` (e.g. from cron).
+    OVERDUE_SWEEP_INTERVAL = int(os.getenv("OVERDUE_SWEEP_INTERVAL", "0"))
+    # Seconds between in-process rebuilds of the 7d/30d leaderboards from recent activity. Boards age out
+    # on their own, so this only repairs drift; 0 leaves it to `flask compact-leaderboards`.
+    LEADERBOARD_COMPACT_INTERVAL = int(os.getenv("LEADERBOARD_COMPACT_INTERVAL", "0"))
+    # Seconds an /admin/analytics report may be reused; writes don't invalidate it, so this bounds staleness.
+    ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "300"))
+    # Per-request query counting, Server-Timing headers and the /admin/perf page.
+    QUERY_PROFILING = os.getenv("QUERY_PROFILING", "0") == "1"
+    # Log requests above these budgets while profiling; 0 disables each check.
+    PERF_QUERY_BUDGET = int(os.getenv("PERF_QUERY_BUDGET", "0"))
+    PERF_LATENCY_BUDGET_MS = float(os.getenv("PERF_LATENCY_BUDGET_MS", "0"))
+    PERF_SLOWEST_KEPT = 5
+    # PRAGMAs applied to every new SQLite connection (ignored on other backends).
+    SQLITE_PRAGMAS: dict = {}
+
+
+class ProductionConfig(Config):
+    """Settings for serving real traffic from a single SQLite file.
+
+    WAL lets readers proceed while a writer commits, busy_timeout makes a
+    blocked writer wait instead of failing immediately, and the memory map and
+    page cache keep hot catalog pages out of the read() path.
+    """
+
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        # Negative means KiB rather than pages: 64 MiB per connection.
+        "cache_size": -64000,
+        "temp_store": "MEMORY",
+    }
+    # Let every gunicorn worker see the others' cache invalidations.
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": 10,
+        "pool_recycle": 3600,
+    }
+
+
+config_profiles = {
+    "default": Config,
+    "production": ProductionConfig,
+}
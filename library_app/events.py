@@ -0,0 +1,216 @@
+"""Append-only circulation event log and replay.
+
+Every booking state change (requested, approved, return requested,
+returned, fined) appends a ``CirculationEvent``. Callers ``record()`` events
+as they go; they are queued on the session and written by one executemany
+INSERT just before the transaction commits, so the log can never disagree
+with the change it describes, and a rolled-back transaction logs nothing.
+
+A booking only moves forward through its lifecycle, so its state is an
+aggregate over its events, and a book's copies out are its approvals minus
+its returns. ``replay`` recomputes both a batch at a time (each batch its
+own short transaction) and reports, or with ``apply=True`` repairs, flags
+and ``copies_available`` counters that have drifted from the log. Fines are
+compared on returned loans only: the overdue sweep accrues fines on open
+loans without logging each increment. ``backfill`` logs the current state
+of bookings that predate the log.
+"""
+from datetime import datetime, time
+from typing import NamedTuple
+
+from sqlalchemy import case, event, exists, func, insert, select, update
+
+from . import db
+from .models import Book, Booking, CirculationEvent
+
+REQUESTED = "requested"
+APPROVED = "approved"
+RETURN_REQUESTED = "return_requested"
+RETURNED = "returned"
+FINED = "fined"
+
+REPLAY_BATCH = 500
+_PENDING = "circulation_events"
+
+
+def record(kind: str, booking_id: int, book_id: int, amount: int = 0) -> None:
+    """Queue an event; it is inserted with the rest of the current transaction."""
+    db.session.info.setdefault(_PENDING, []).append(
+        {"booking_id": booking_id, "book_id": book_id, "kind": kind, "amount": amount}
+    )
+
+
+@event.listens_for(db.session, "before_commit")
+def _write_pending(session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        now = datetime.utcnow()
+        session.execute(insert(CirculationEvent), [{**row, "created_at": now} for row in pending])
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction) -> None:
+    session.info.pop(_PENDING, None)
+
+
+def _booking_events(booking) -> list[dict]:
+    """The events that would have led to ``booking``'s current state."""
+    base = {"booking_id": booking.id, "book_id": booking.book_id, "amount": 0}
+    events = [{**base, "kind": REQUESTED, "created_at": booking.created_at}]
+    if booking.approved:
+        events.append({**base, "kind": APPROVED, "created_at": booking.created_at})
+    if booking.return_requested and not booking.returned:
+        events.append({**base, "kind": RETURN_REQUESTED, "created_at": booking.updated_at})
+    if booking.returned:
+        returned_at = datetime.combine(booking.returned_at, time()) if booking.returned_at else booking.updated_at
+        events.append({**base, "kind": RETURNED, "created_at": returned_at})
+        if booking.fine_amount:
+            events.append({**base, "kind": FINED, "amount": booking.fine_amount, "created_at": returned_at})
+    return events
+
+
+def backfill(batch_size: int = REPLAY_BATCH) -> int:
+    """Log the current state of every booking that has no events yet; returns how many were logged."""
+    logged = 0
+    last_id = 0
+    unlogged = ~exists().where(CirculationEvent.booking_id == Booking.id)
+    while True:
+        bookings = db.session.execute(
+            select(Booking).where(Booking.id > last_id, unlogged).order_by(Booking.id).limit(batch_size)
+        ).scalars().all()
+        if not bookings:
+            return logged
+        db.session.execute(insert(CirculationEvent), [row for booking in bookings for row in _booking_events(booking)])
+        db.session.commit()
+        logged += len(bookings)
+        last_id = bookings[-1].id
+
+
+class ReplayReport(NamedTuple):
+    bookings_checked: int
+    bookings_drifted: list[int]
+    bookings_unlogged: int
+    books_checked: int
+    books_drifted: list[int]
+    # Books whose counter moved between reading and repairing; a later replay picks them up.
+    books_skipped: list[int]
+
+
+def _flag(kind: str):
+    return func.max(case((CirculationEvent.kind == kind, 1), else_=0))
+
+
+def _replay_bookings(booking_ids: list[int], apply: bool) -> tuple[list[int], int]:
+    logged = {
+        row.booking_id: row
+        for row in db.session.execute(
+            select(
+                CirculationEvent.booking_id,
+                _flag(APPROVED).label("approved"),
+                _flag(RETURN_REQUESTED).label("return_requested"),
+                _flag(RETURNED).label("returned"),
+                func.max(case((CirculationEvent.kind == RETURNED, CirculationEvent.created_at))).label("returned_at"),
+                func.max(case((CirculationEvent.kind == FINED, CirculationEvent.amount), else_=0)).label("fine"),
+            )
+            .where(CirculationEvent.booking_id.in_(booking_ids))
+            .group_by(CirculationEvent.booking_id)
+        )
+    }
+    current = db.session.execute(
+        select(
+            Booking.id,
+            Booking.approved,
+            Booking.return_requested,
+            Booking.returned,
+            Booking.returned_at,
+            Booking.fine_amount,
+        ).where(Booking.id.in_(booking_ids))
+    ).all()
+
+    drifted, unlogged = [], 0
+    for booking in current:
+        events = logged.get(booking.id)
+        if events is None:
+            unlogged += 1
+            continue
+        returned = bool(events.returned)
+        expected = {
+            "approved": bool(events.approved),
+            "returned": returned,
+            "return_requested": bool(events.return_requested) and not returned,
+        }
+        if returned:
+            expected["fine_amount"] = events.fine
+            if booking.returned_at is None and events.returned_at is not None:
+                # Filled in only where missing: the event's UTC timestamp can fall on a different day.
+                expected["returned_at"] = events.returned_at.date()
+        changes = {name: value for name, value in expected.items() if getattr(booking, name) != value}
+        if changes:
+            drifted.append(booking.id)
+            if apply:
+                db.session.execute(update(Booking).where(Booking.id == booking.id).values(**changes))
+    return drifted, unlogged
+
+
+def _replay_books(book_ids: list[int], apply: bool) -> tuple[list[int], list[int]]:
+    out = dict(
+        db.session.execute(
+            select(
+                CirculationEvent.book_id,
+                func.sum(case((CirculationEvent.kind == APPROVED, 1), else_=-1)),
+            )
+            .where(CirculationEvent.book_id.in_(book_ids), CirculationEvent.kind.in_((APPROVED, RETURNED)))
+            .group_by(CirculationEvent.book_id)
+        ).all()
+    )
+    drifted, skipped = [], []
+    for book_id, total, available in db.session.execute(
+        select(Book.id, Book.copies_total, Book.copies_available).where(Book.id.in_(book_ids))
+    ).all():
+        expected = max((total or 0) - (out.get(book_id) or 0), 0)
+        if available == expected:
+            continue
+        drifted.append(book_id)
+        if apply:
+            # Conditional on the value just read, so a loan approved meanwhile isn't overwritten.
+            repaired = db.session.execute(
+                update(Book)
+                .where(Book.id == book_id, Book.copies_available == available)
+                .values(copies_available=expected)
+            ).rowcount
+            if not repaired:
+                skipped.append(book_id)
+    return drifted, skipped
+
+
+def _id_batches(column, batch_size: int):
+    last_id = 0
+    while True:
+        ids = db.session.execute(select(column).where(column > last_id).order_by(column).limit(batch_size)).scalars().all()
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def replay(apply: bool = False, batch_size: int = REPLAY_BATCH) -> ReplayReport:
+    """Compare bookings and copy counters against the log; with ``apply``, repair what drifted."""
+    bookings_checked = books_checked = bookings_unlogged = 0
+    bookings_drifted: list[int] = []
+    books_drifted: list[int] = []
+    books_skipped: list[int] = []
+    for booking_ids in _id_batches(Booking.id, batch_size):
+        drifted, unlogged = _replay_bookings(booking_ids, apply)
+        db.session.commit()
+        bookings_checked += len(booking_ids)
+        bookings_drifted += drifted
+        bookings_unlogged += unlogged
+    # Loans that predate the log would count as on the shelf, so counters are only repaired once it is complete.
+    repair_books = apply and not bookings_unlogged
+    for book_ids in _id_batches(Book.id, batch_size):
+        drifted, skipped = _replay_books(book_ids, repair_books)
+        db.session.commit()
+        books_checked += len(book_ids)
+        books_drifted += drifted
+        books_skipped += skipped
+    return ReplayReport(bookings_checked, bookings_drifted, bookings_unlogged, books_checked, books_drifted, books_skipped)
@@ -0,0 +1,194 @@
+"""Streaming circulation exports (bookings, fines, ratings) as CSV or JSON Lines.
+
+Rows come from a plain column SELECT executed with ``yield_per``, so the
+driver hands them over a batch at a time, and are serialised into one text
+chunk per batch. Neither the endpoint (a generator response) nor ``flask
+export`` ever holds more than ``EXPORT_BATCH`` rows, however long the export.
+Filters map onto indexed columns: the date range onto ``Booking.start_date``
+(``Rating.created_at`` for ratings) and walks that index in order.
+
+CSV text cells that a spreadsheet would run as a formula (leading ``=``,
+``+``, ``-``, ``@``, tab or carriage return) are prefixed with ``'``, since
+names, emails and comments come from members.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterator, NamedTuple
+
+from sqlalchemy import case, select
+
+from . import db
+from .models import Book, Booking, Rating, User
+
+EXPORT_BATCH = 1000
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+STATUSES = ("pending", "open", "overdue", "returned")
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class ExportFilters(NamedTuple):
+    start: date | None = None
+    end: date | None = None
+    status: str | None = None
+    min_fine: int | None = None
+
+
+def parse_filters(values, kind: str = "bookings") -> ExportFilters:
+    """Build ``kind``'s filters from a mapping of strings (query args, CLI options); raises ``ValueError``."""
+
+    def day(name: str) -> date | None:
+        raw = (values.get(name) or "").strip()
+        return date.fromisoformat(raw) if raw else None
+
+    status = (values.get("status") or "").strip() or None
+    if status and status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    min_fine = (values.get("min_fine") or "").strip()
+    if kind == "ratings" and (status or min_fine):
+        raise ValueError("status and min_fine don't apply to ratings")
+    return ExportFilters(day("start"), day("end"), status, int(min_fine) if min_fine else None)
+
+
+def _booking_status():
+    return case(
+        (Booking.approved.is_not(True), "pending"),
+        (Booking.returned.is_(True), "returned"),
+        (Booking.end_date < date.today(), "overdue"),
+        else_="open",
+    )
+
+
+def _booking_query(columns: list, filters: ExportFilters):
+    query = (
+        select(*columns)
+        .join(User, User.id == Booking.user_id)
+        .join(Book, Book.id == Booking.book_id)
+        .order_by(Booking.start_date, Booking.id)
+    )
+    if filters.start:
+        query = query.where(Booking.start_date >= filters.start)
+    if filters.end:
+        query = query.where(Booking.start_date <= filters.end)
+    if filters.status == "pending":
+        query = query.where(Booking.approved.is_not(True))
+    elif filters.status == "returned":
+        query = query.where(Booking.approved.is_(True), Booking.returned.is_(True))
+    elif filters.status in ("open", "overdue"):
+        query = query.where(Booking.approved.is_(True), Booking.returned.is_not(True))
+        if filters.status == "overdue":
+            query = query.where(Booking.end_date < date.today())
+    if filters.min_fine is not None:
+        query = query.where(Booking.fine_amount >= filters.min_fine)
+    return query
+
+
+def bookings_query(filters: ExportFilters):
+    return _booking_query(
+        [
+            Booking.id,
+            Booking.user_id,
+            User.name.label("member"),
+            User.email,
+            Booking.book_id,
+            Book.title,
+            Book.isbn,
+            Booking.start_date,
+            Booking.end_date,
+            _booking_status().label("status"),
+            Booking.returned_at,
+            Booking.fine_amount,
+            Booking.created_at,
+        ],
+        filters,
+    )
+
+
+def fines_query(filters: ExportFilters):
+    if filters.min_fine is None or filters.min_fine < 1:
+        filters = filters._replace(min_fine=1)
+    return _booking_query(
+        [
+            Booking.id.label("booking_id"),
+            User.name.label("member"),
+            User.email,
+            Book.title,
+            Booking.start_date,
+            Booking.end_date,
+            Booking.returned_at,
+            _booking_status().label("status"),
+            Booking.fine_amount,
+        ],
+        filters,
+    )
+
+
+def ratings_query(filters: ExportFilters):
+    query = (
+        select(
+            Rating.id,
+            Rating.user_id,
+            User.name.label("member"),
+            Rating.book_id,
+            Book.title,
+            Rating.score,
+            Rating.comment,
+            Rating.created_at,
+        )
+        .join(User, User.id == Rating.user_id)
+        .join(Book, Book.id == Rating.book_id)
+        .order_by(Rating.created_at, Rating.id)
+    )
+    if filters.start:
+        query = query.where(Rating.created_at >= datetime.combine(filters.start, datetime.min.time()))
+    if filters.end:
+        query = query.where(Rating.created_at < datetime.combine(filters.end + timedelta(days=1), datetime.min.time()))
+    return query
+
+
+EXPORTS = {"bookings": bookings_query, "fines": fines_query, "ratings": ratings_query}
+
+
+def _text(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_export(
+    kind: str, fmt: str, filters: ExportFilters, report: Callable[[int], None] | None = None
+) -> Iterator[str]:
+    """Yield the export as text chunks of up to ``EXPORT_BATCH`` rows each; ``report`` gets the running row count."""
+    query = EXPORTS[kind](filters)
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH))
+    columns = list(result.keys())
+    written = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(columns)
+    try:
+        for batch in result.partitions():
+            for row in batch:
+                values = [_text(value) for value in row]
+                if writer:
+                    writer.writerow([_csv_cell(value) for value in values])
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values))) + "\n")
+            written += len(batch)
+            if report:
+                report(written)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        result.close()
@@ -0,0 +1,37 @@
+"""Rendered-fragment cache for the catalog pages.
+
+The catalog grid (filters, book rows and pagination links) is rendered once
+per ``(page, query args)`` and kept as HTML in the app cache under the
+``catalog`` tag. Routes that change what the grid shows (book edits, ratings,
+copies going out or coming back) call ``bump_catalog()``, which drops every
+cached grid at once. With the shared ``sqlite`` cache backend that reaches all
+workers; with the per-process ``memory`` backend ``CATALOG_CACHE_TTL`` bounds
+how long another worker's writes can go unseen, as with the dashboard cache.
+"""
+from typing import Callable
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from markupsafe import Markup
+
+from . import cache
+
+CATALOG_TAG = "catalog"
+
+
+def bump_catalog() -> None:
+    cache.invalidate_tag(CATALOG_TAG)
+
+
+def catalog_fragment(render: Callable[[], str]) -> Markup:
+    """Return the catalog grid for this request, rendering it only on a miss."""
+    ttl = current_app.config.get("CATALOG_CACHE_TTL", 0)
+    if not ttl:
+        return Markup(render())
+
+    key = f"catalog:{request.endpoint}?{urlencode(sorted(request.args.items(multi=True)))}"
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html, ttl, tags=(CATALOG_TAG,))
+    return Markup(html)
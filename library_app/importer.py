@@ -0,0 +1,149 @@
+"""Streaming bulk catalog import.
+
+Rows are read lazily from CSV or JSON Lines, so memory stays flat however
+large the file is. Categories are resolved from one pre-fetched name -> id
+map, and books are upserted by ISBN a batch at a time: one
+``INSERT ... ON CONFLICT`` statement executed over the whole batch.
+
+Recognised fields: ``isbn``, ``title``, ``author`` (required) and
+``description``, ``category``, ``copies_total``, ``copies_available``.
+"""
+import csv
+import json
+import sys
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy import case, func
+
+from . import db
+from .models import Book, Category
+
+REQUIRED_FIELDS = ("isbn", "title", "author")
+
+
+def iter_records(stream, fmt: str) -> Iterator[dict | None]:
+    """Yield one record per row; a JSON line that doesn't parse yields None and is skipped downstream."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def _upsert_statement():
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        raise RuntimeError(f"import-books has no upsert for the {dialect} dialect")
+
+    stmt = insert(Book.__table__)
+    incoming = stmt.inserted if dialect in ("mysql", "mariadb") else stmt.excluded
+    # Keep copies already out on loan: shift availability by the change in total, floored at 0.
+    shifted = Book.copies_available + incoming.copies_total - Book.copies_total
+    updates = {
+        "title": incoming.title,
+        "author": incoming.author,
+        # A row without description/category leaves the stored value alone.
+        "description": func.coalesce(incoming.description, Book.description),
+        "category_id": func.coalesce(incoming.category_id, Book.category_id),
+        "copies_total": incoming.copies_total,
+        "copies_available": case((shifted < 0, 0), else_=shifted),
+        "updated_at": incoming.updated_at,
+    }
+    if dialect in ("mysql", "mariadb"):
+        return stmt.on_duplicate_key_update(**updates)
+    return stmt.on_conflict_do_update(index_elements=[Book.isbn], set_=updates)
+
+
+def _category_id(name: str | None, categories: dict[str, int]) -> int | None:
+    if not name:
+        return None
+    name = name.strip()
+    if name not in categories:
+        category = Category(name=name)
+        db.session.add(category)
+        db.session.flush()
+        categories[name] = category.id
+    return categories[name]
+
+
+def _to_row(record, categories: dict[str, int], now: datetime) -> dict | None:
+    if not isinstance(record, dict):
+        return None
+    values = {key: (str(record.get(key) or "").strip()) for key in REQUIRED_FIELDS}
+    if not all(values.values()):
+        return None
+    try:
+        copies_total = int(record.get("copies_total") or 1)
+        copies_available = record.get("copies_available")
+        copies_available = int(copies_available) if copies_available not in (None, "") else copies_total
+    except (TypeError, ValueError):
+        return None
+    return {
+        **values,
+        "description": record.get("description") or None,
+        "category_id": _category_id(record.get("category"), categories),
+        "copies_total": copies_total,
+        "copies_available": copies_available,
+        "rating_count": 0,
+        "rating_sum": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def import_books(
+    records: Iterable[dict | None],
+    batch_size: int = 5000,
+    progress: Callable[[int, int, float], None] | None = None,
+) -> tuple[int, int, float]:
+    """Upsert ``records`` and return ``(rows_written, rows_skipped, seconds)``."""
+    categories = dict(db.session.query(Category.name, Category.id))
+    upsert = _upsert_statement()
+    started = time.perf_counter()
+    written = skipped = 0
+    records = iter(records)
+
+    while True:
+        chunk = list(islice(records, batch_size))
+        if not chunk:
+            break
+        now = datetime.utcnow()
+        # Last row wins for an ISBN repeated inside one batch; Postgres rejects touching a row twice.
+        batch: dict[str, dict] = {}
+        for record in chunk:
+            row = _to_row(record, categories, now)
+            if row is None:
+                skipped += 1
+                continue
+            batch[row["isbn"]] = row
+        if batch:
+            # executemany keeps each statement under SQLite's bound-parameter limit.
+            db.session.connection().execute(upsert, list(batch.values()))
+            db.session.commit()
+        written += len(batch)
+        if progress:
+            progress(written, skipped, time.perf_counter() - started)
+
+    return written, skipped, time.perf_counter() - started
+
+
+def open_source(path: str):
+    if path == "-":
+        # Callers close what they open; stdin isn't theirs to close.
+        return nullcontext(sys.stdin)
+    return open(path, newline="", encoding="utf-8")
@@ -0,0 +1,331 @@
+"""Copy reservation and booking state transitions.
+
+Each transition is a conditional UPDATE whose rowcount says whether it won,
+so two librarians approving at once can neither oversell a book nor apply
+the same approval twice. SQLite reports writer contention as "database is
+locked"; ``with_lock_retry`` rolls back and retries those with jittered
+backoff.
+
+Returning a copy also serves the book's waitlist: the oldest holds become
+approved loans in the same transaction and take the freed copies directly.
+Only copies nobody is waiting for go back on the shelf, so a copy with a
+queue behind it is never advertised to whoever happens to refresh first.
+"""
+import random
+import time
+from collections import Counter
+from datetime import date, timedelta
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy import Integer, case, cast, delete, func, literal, select, update
+from sqlalchemy.exc import OperationalError
+
+from . import db, events, leaderboards
+from .models import Book, Booking, Hold
+
+FINE_PER_DAY = 100
+# Length of the loan a promoted hold turns into, matching the member form's default.
+HOLD_LOAN_DAYS = 7
+
+
+def is_lock_error(exc: OperationalError) -> bool:
+    message = str(exc.orig).lower()
+    return "database is locked" in message or "deadlock" in message
+
+
+def with_lock_retry(func):
+    """Re-run a whole unit of work when the database reports lock contention."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        attempts = current_app.config.get("DB_LOCK_RETRIES", 5)
+        backoff = current_app.config.get("DB_LOCK_BACKOFF", 0.05)
+        for attempt in range(attempts):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                db.session.rollback()
+                if not is_lock_error(exc) or attempt == attempts - 1:
+                    raise
+                time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+        return None
+
+    return wrapper
+
+
+def reserve_copy(book_id: int) -> bool:
+    """Take one copy off the shelf; False when none are left."""
+    result = db.session.execute(
+        update(Book)
+        .where(Book.id == book_id, Book.copies_available > 0)
+        .values(copies_available=Book.copies_available - 1)
+    )
+    return result.rowcount == 1
+
+
+def release_copy(book_id: int) -> None:
+    db.session.execute(
+        update(Book)
+        .where(Book.id == book_id)
+        .values(copies_available=Book.copies_available + 1)
+    )
+
+
+def fine_for(end_date: date, returned_at: date) -> int:
+    return max((returned_at - end_date).days, 0) * FINE_PER_DAY
+
+
+def days_between(later, earlier):
+    """Whole days from ``earlier`` to ``later`` as a SQL expression for the current dialect."""
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        return cast(func.julianday(later) - func.julianday(earlier), Integer)
+    if dialect in ("mysql", "mariadb"):
+        return func.datediff(later, earlier)
+    return later - earlier
+
+
+def promote_holds(freed: Counter) -> Counter:
+    """Hand freed copies to the oldest holds on each book as approved loans.
+
+    Runs inside the caller's transaction and returns how many copies of each
+    book were handed over; the caller puts only the rest back on the shelf.
+    Each hold is claimed with a conditional DELETE, so two returns racing for
+    one book can't promote the same member twice.
+    """
+    today = date.today()
+    promoted_bookings = []
+    for book_id, copies in freed.items():
+        queue = db.session.execute(
+            select(Hold.id, Hold.user_id).where(Hold.book_id == book_id).order_by(Hold.id).limit(copies)
+        ).all()
+        for hold in queue:
+            if not db.session.execute(delete(Hold).where(Hold.id == hold.id)).rowcount:
+                continue
+            booking = Booking(
+                user_id=hold.user_id,
+                book_id=book_id,
+                start_date=today,
+                end_date=today + timedelta(days=HOLD_LOAN_DAYS),
+                approved=True,
+                return_requested=False,
+                returned=False,
+                fine_amount=0,
+            )
+            db.session.add(booking)
+            promoted_bookings.append(booking)
+    handed = Counter(booking.book_id for booking in promoted_bookings)
+    if promoted_bookings:
+        db.session.flush()
+        leaderboards.record_borrows(handed)
+        for booking in promoted_bookings:
+            events.record(events.REQUESTED, booking.id, booking.book_id)
+            events.record(events.APPROVED, booking.id, booking.book_id)
+    return handed
+
+
+class RaceLost(Exception):
+    """A set-based write touched fewer rows than planned; the caller re-plans."""
+
+
+@with_lock_retry
+def approve_booking(booking_id: int, book_id: int) -> str:
+    """Return ``"approved"``, ``"already_approved"`` or ``"unavailable"``."""
+    claimed = db.session.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.approved.is_not(True))
+        .values(approved=True)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return "already_approved"
+    if not reserve_copy(book_id):
+        db.session.rollback()
+        return "unavailable"
+    leaderboards.record_borrows(Counter({book_id: 1}))
+    events.record(events.APPROVED, booking_id, book_id)
+    db.session.commit()
+    return "approved"
+
+
+@with_lock_retry
+def create_approved_booking(**fields) -> Booking | None:
+    """Insert a booking that is approved on creation, or return None if no copy is free."""
+    if not reserve_copy(fields["book_id"]):
+        db.session.rollback()
+        return None
+    booking = Booking(approved=True, return_requested=False, returned=False, fine_amount=0, **fields)
+    db.session.add(booking)
+    leaderboards.record_borrows(Counter({fields["book_id"]: 1}))
+    db.session.flush()
+    events.record(events.REQUESTED, booking.id, booking.book_id)
+    events.record(events.APPROVED, booking.id, booking.book_id)
+    db.session.commit()
+    return booking
+
+
+@with_lock_retry
+def return_booking(booking_id: int, book_id: int, end_date: date) -> int | None:
+    """Close an approved loan, handing its copy to the next hold; return the fine, or None if already closed."""
+    returned_at = date.today()
+    fine = fine_for(end_date, returned_at)
+    claimed = db.session.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.approved.is_(True), Booking.returned.is_not(True))
+        .values(returned=True, return_requested=False, returned_at=returned_at, fine_amount=fine)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return None
+    events.record(events.RETURNED, booking_id, book_id)
+    if fine:
+        events.record(events.FINED, booking_id, book_id, fine)
+    if not promote_holds(Counter({book_id: 1})):
+        release_copy(book_id)
+    db.session.commit()
+    return fine
+
+
+def _shift_copies(per_book: Counter, sign: int) -> bool:
+    """Move ``per_book[book_id]`` copies for every book in one UPDATE.
+
+    Taking copies (``sign=-1``) only succeeds if every book still has enough
+    left; the rowcount tells us whether any book came up short.
+    """
+    delta = case(dict(per_book), value=Book.id)
+    stmt = (
+        update(Book)
+        .where(Book.id.in_(per_book))
+        .values(copies_available=Book.copies_available + sign * delta)
+        .execution_options(synchronize_session=False)
+    )
+    if sign < 0:
+        stmt = stmt.where(Book.copies_available >= delta)
+    return db.session.execute(stmt).rowcount == len(per_book)
+
+
+def _bulk(plan):
+    """Run a plan/apply unit, re-planning a few times if a concurrent writer got in between.
+
+    If every attempt loses, nothing is written and each id is reported back as failed.
+    """
+
+    @wraps(plan)
+    @with_lock_retry
+    def wrapper(ids):
+        for _ in range(4):
+            try:
+                return plan(ids)
+            except RaceLost:
+                db.session.rollback()
+        return [], {item_id: "conflict, retry" for item_id in ids}
+
+    return wrapper
+
+
+@_bulk
+def approve_bookings(booking_ids: list[int]) -> tuple[list[int], dict[int, str]]:
+    """Approve many bookings in one transaction; return ``(approved_ids, {id: reason})``.
+
+    Copies are handed out oldest request first per book, and taken with one
+    conditional UPDATE across all books involved.
+    """
+    failed: dict[int, str] = {}
+    rows = db.session.execute(
+        select(Booking.id, Booking.book_id, Booking.approved).where(Booking.id.in_(booking_ids)).order_by(Booking.id)
+    ).all()
+    found = {row.id for row in rows}
+    failed.update({booking_id: "not found" for booking_id in booking_ids if booking_id not in found})
+
+    pending = [row for row in rows if not row.approved]
+    failed.update({row.id: "already approved" for row in rows if row.approved})
+    available = dict(
+        db.session.execute(
+            select(Book.id, Book.copies_available).where(Book.id.in_({row.book_id for row in pending}))
+        ).all()
+    )
+
+    granted: list[int] = []
+    per_book: Counter = Counter()
+    for row in pending:
+        if per_book[row.book_id] < (available.get(row.book_id) or 0):
+            per_book[row.book_id] += 1
+            granted.append(row.id)
+        else:
+            failed[row.id] = "no copies left"
+
+    if granted:
+        granted_ids = set(granted)
+        if not _shift_copies(per_book, -1):
+            raise RaceLost()
+        claimed = db.session.execute(
+            update(Booking)
+            .where(Booking.id.in_(granted), Booking.approved.is_not(True))
+            .values(approved=True)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != len(granted):
+            raise RaceLost()
+        leaderboards.record_borrows(per_book)
+        for row in pending:
+            if row.id in granted_ids:
+                events.record(events.APPROVED, row.id, row.book_id)
+    db.session.commit()
+    return granted, failed
+
+
+@_bulk
+def return_bookings(booking_ids: list[int]) -> tuple[list[int], dict[int, str]]:
+    """Close many loans at once, settling fines in SQL; return ``(returned_ids, {id: reason})``."""
+    failed: dict[int, str] = {}
+    rows = db.session.execute(
+        select(Booking.id, Booking.book_id, Booking.approved, Booking.returned, Booking.end_date).where(
+            Booking.id.in_(booking_ids)
+        )
+    ).all()
+    found = {row.id for row in rows}
+    failed.update({booking_id: "not found" for booking_id in booking_ids if booking_id not in found})
+
+    closing = []
+    for row in rows:
+        if not row.approved:
+            failed[row.id] = "not approved"
+        elif row.returned:
+            failed[row.id] = "already returned"
+        else:
+            closing.append(row)
+
+    if closing:
+        today = date.today()
+        overdue_days = days_between(literal(today, db.Date), Booking.end_date)
+        claimed = db.session.execute(
+            update(Booking)
+            .where(
+                Booking.id.in_([row.id for row in closing]),
+                Booking.approved.is_(True),
+                Booking.returned.is_not(True),
+            )
+            .values(
+                returned=True,
+                return_requested=False,
+                returned_at=today,
+                fine_amount=case((overdue_days > 0, overdue_days * FINE_PER_DAY), else_=0),
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != len(closing):
+            raise RaceLost()
+        for row in closing:
+            events.record(events.RETURNED, row.id, row.book_id)
+            # Same formula as the fine_amount expression above.
+            fine = fine_for(row.end_date, today)
+            if fine:
+                events.record(events.FINED, row.id, row.book_id, fine)
+        freed = Counter(row.book_id for row in closing)
+        # Copies handed to holds never touch the shelf; Counter subtraction drops the fully handed books.
+        shelved = freed - promote_holds(freed)
+        if shelved:
+            _shift_copies(shelved, +1)
+    db.session.commit()
+    return [row.id for row in closing], failed
@@ -0,0 +1,363 @@
+"""Materialised "most borrowed" and "top rated" leaderboards.
+
+Each approved loan and each rating is folded in as it is written, inside the
+writer's transaction: into the book's ``book_activity`` row for that day and
+into its ``leaderboard_entries`` row for every period (7d, 30d, all time),
+with upserts that add the deltas. Entries carry the book's category, and the
+``(period, category_id, metric, book_id)`` indexes make reading a board a walk
+over its first K index entries.
+
+Days age out of the 7d/30d boards without any scheduled job. Each windowed
+board keeps a watermark in ``leaderboard_windows``. Once a day has passed,
+the first write or board read subtracts the activity of the days that have
+left the window since then, from ``book_activity``, and moves the watermark
+on. Activity older than the longest window is then dropped.
+
+``compact()`` (``flask compact-leaderboards``) rebuilds the windowed boards
+from ``book_activity``, which repairs any drift. It is cheap and needs no
+scheduling. ``resync_all_time()`` (``--all-time``) recounts the all-time
+boards from every approved loan, and ``rebuild()`` (``--rebuild``) recreates
+everything from loan and rating history. Both scan all loans, so they only
+run when asked for.
+"""
+import threading
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from flask import Flask
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+
+from . import db
+from .models import Book, BookActivity, Booking, LeaderboardEntry, LeaderboardWindow, Rating
+from .scheduler import start_periodic
+
+PERIODS = {"7d": 7, "30d": 30, "all": None}
+WINDOWS = {period: days for period, days in PERIODS.items() if days}
+PERIOD_LABELS = {"7d": "Last 7 days", "30d": "Last 30 days", "all": "All time"}
+METRICS = ("borrowed", "rated")
+# Activity older than the longest window is only needed by the all-time entries, which keep their own totals.
+HISTORY_DAYS = max(WINDOWS.values())
+# "Top rated" ranks by a Bayesian average: each book starts with PRIOR_WEIGHT ratings of PRIOR_MEAN,
+# so a single 5-star rating can't outrank a book with dozens of 4s.
+PRIOR_MEAN = 3.0
+PRIOR_WEIGHT = 5
+
+
+def rating_score(rating_sum, rating_count):
+    return (rating_sum + PRIOR_MEAN * PRIOR_WEIGHT) / (rating_count + PRIOR_WEIGHT)
+
+
+def _insert_for_dialect():
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+    else:
+        raise RuntimeError(f"leaderboards have no upsert for the {dialect} dialect")
+    return dialect, dialect_insert
+
+
+def _add(model, keys: list[str], rows: list[dict]) -> None:
+    """Insert ``rows``, or add their counters onto the rows already at the same key."""
+    if not rows:
+        return
+    dialect, dialect_insert = _insert_for_dialect()
+    table = model.__table__
+    stmt = dialect_insert(table)
+    incoming = stmt.inserted if dialect in ("mysql", "mariadb") else stmt.excluded
+    updates = {}
+    if "rating_score" in table.c:
+        # Listed first: MySQL applies assignments in order and would otherwise see the updated sums.
+        updates["rating_score"] = rating_score(
+            table.c.rating_sum + incoming.rating_sum, table.c.rating_count + incoming.rating_count
+        )
+    for name in ("borrows", "rating_count", "rating_sum"):
+        updates[name] = table.c[name] + incoming[name]
+    if dialect in ("mysql", "mariadb"):
+        stmt = stmt.on_duplicate_key_update(updates)
+    else:
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_=updates)
+    db.session.execute(stmt, rows)
+
+
+def record(events: list[tuple[int, date, int, int, int]], today: date | None = None) -> None:
+    """Fold ``(book_id, day, borrows, rating_count, rating_sum)`` deltas into activity and entries."""
+    if not events:
+        return
+    today = today or date.today()
+    # Age out what has left each window first, so ``age`` below and the watermarks agree.
+    expire(today)
+    categories = dict(
+        db.session.execute(
+            select(Book.id, Book.category_id).where(Book.id.in_({event[0] for event in events}))
+        ).all()
+    )
+    # Plain lists rather than Counters: removals are negative deltas, which Counter addition drops.
+    activity: dict[tuple, list[int]] = defaultdict(lambda: [0, 0, 0])
+    entries: dict[tuple, list[int]] = defaultdict(lambda: [0, 0, 0])
+    for book_id, day, *deltas in events:
+        if book_id not in categories:
+            continue
+        age = (today - day).days
+        targets = [entries[(period, book_id)] for period, days in PERIODS.items() if days is None or age < days]
+        if age < HISTORY_DAYS:
+            targets.append(activity[(book_id, day)])
+        for totals in targets:
+            for position, delta in enumerate(deltas):
+                totals[position] += delta
+
+    _add(
+        BookActivity,
+        ["book_id", "day"],
+        [
+            {"book_id": book_id, "day": day, "borrows": borrows, "rating_count": count, "rating_sum": total}
+            for (book_id, day), (borrows, count, total) in activity.items()
+        ],
+    )
+    _add(
+        LeaderboardEntry,
+        ["period", "book_id"],
+        [
+            {
+                "period": period,
+                "book_id": book_id,
+                "category_id": categories[book_id],
+                "borrows": borrows,
+                "rating_count": count,
+                "rating_sum": total,
+                "rating_score": rating_score(total, count),
+            }
+            for (period, book_id), (borrows, count, total) in entries.items()
+        ],
+    )
+
+
+def record_borrows(per_book: Counter) -> None:
+    today = date.today()
+    record([(book_id, today, copies, 0, 0) for book_id, copies in per_book.items()], today)
+
+
+def record_rating(book_id: int, score: int) -> None:
+    today = date.today()
+    record([(book_id, today, 0, 1, score)], today)
+
+
+def remove_user_ratings(user_id: int) -> None:
+    """Take a user's ratings back out of every board, on the days they were given."""
+    day = func.date(Rating.created_at)
+    totals = db.session.execute(
+        select(Rating.book_id, day, func.count(Rating.id), func.sum(Rating.score))
+        .where(Rating.user_id == user_id)
+        .group_by(Rating.book_id, day)
+    )
+    record([(book_id, _as_date(given), 0, -count, -total) for book_id, given, count, total in totals])
+
+
+def _as_date(value) -> date:
+    # SQLite's date() comes back as an ISO string; other dialects return a date.
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def move_book(book_id: int, category_id: int | None) -> None:
+    db.session.execute(
+        update(LeaderboardEntry).where(LeaderboardEntry.book_id == book_id).values(category_id=category_id)
+    )
+
+
+def board_query(metric: str, period: str, category_id: int | None = None, limit: int = 5):
+    if metric == "borrowed":
+        order, present = LeaderboardEntry.borrows, LeaderboardEntry.borrows > 0
+    else:
+        order, present = LeaderboardEntry.rating_score, LeaderboardEntry.rating_count > 0
+    query = (
+        db.session.query(Book, LeaderboardEntry)
+        .join(Book, Book.id == LeaderboardEntry.book_id)
+        .filter(LeaderboardEntry.period == period, present)
+    )
+    if category_id:
+        query = query.filter(LeaderboardEntry.category_id == category_id)
+    return query.order_by(order.desc(), LeaderboardEntry.book_id.desc()).limit(limit)
+
+
+def top(metric: str, period: str, category_id: int | None = None, limit: int = 5) -> list[tuple[Book, LeaderboardEntry]]:
+    """The first ``limit`` books of one board, best first."""
+    if period in WINDOWS and expire():
+        db.session.commit()
+    return board_query(metric, period, category_id, limit).all()
+
+
+ENTRY_COLUMNS = ["period", "book_id", "category_id", "borrows", "rating_count", "rating_sum", "rating_score"]
+
+
+def _rebuild_windows(today: date) -> None:
+    """Recompute the 7d/30d entries from ``book_activity`` and reset their watermarks (caller commits)."""
+    db.session.execute(delete(BookActivity).where(BookActivity.day <= today - timedelta(days=HISTORY_DAYS)))
+    db.session.execute(delete(LeaderboardWindow))
+    sums = [func.sum(getattr(BookActivity, name)) for name in ("borrows", "rating_count", "rating_sum")]
+    for period, days in WINDOWS.items():
+        db.session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.period == period))
+        source = (
+            select(literal(period), Book.id, Book.category_id, *sums, rating_score(sums[2], sums[1]))
+            .join(Book, Book.id == BookActivity.book_id)
+            .where(BookActivity.day > today - timedelta(days=days))
+            .group_by(Book.id, Book.category_id)
+        )
+        db.session.execute(insert(LeaderboardEntry).from_select(ENTRY_COLUMNS, source))
+        db.session.add(LeaderboardWindow(period=period, expired_through=today - timedelta(days=days)))
+    db.session.flush()
+
+
+def expire(today: date | None = None) -> bool:
+    """Take activity that has aged out of each windowed board back out of it; True if anything moved.
+
+    Runs in the caller's transaction. A watermark is claimed with a conditional UPDATE before its
+    days are subtracted, so two workers can't subtract the same days twice.
+    """
+    today = today or date.today()
+    marks = dict(db.session.execute(select(LeaderboardWindow.period, LeaderboardWindow.expired_through)).all())
+    if set(marks) != set(WINDOWS):
+        # No watermarks yet (new or upgraded database): start from what book_activity holds.
+        _rebuild_windows(today)
+        return True
+
+    entries = LeaderboardEntry.__table__
+    # rating_score first: MySQL applies assignments in order and would otherwise see the updated sums.
+    take_back = (
+        update(entries)
+        .where(entries.c.period == bindparam("entry_period"), entries.c.book_id == bindparam("entry_book_id"))
+        .values(
+            rating_score=rating_score(
+                entries.c.rating_sum - bindparam("aged_sum"), entries.c.rating_count - bindparam("aged_count")
+            ),
+            borrows=entries.c.borrows - bindparam("aged_borrows"),
+            rating_count=entries.c.rating_count - bindparam("aged_count"),
+            rating_sum=entries.c.rating_sum - bindparam("aged_sum"),
+        )
+    )
+    moved = False
+    for period, days in WINDOWS.items():
+        cutoff = today - timedelta(days=days)
+        expired_through = marks[period]
+        if expired_through >= cutoff:
+            continue
+        claimed = db.session.execute(
+            update(LeaderboardWindow)
+            .where(LeaderboardWindow.period == period, LeaderboardWindow.expired_through == expired_through)
+            .values(expired_through=cutoff)
+        ).rowcount
+        if not claimed:
+            continue
+        moved = True
+        aged = db.session.execute(
+            select(
+                BookActivity.book_id,
+                func.sum(BookActivity.borrows),
+                func.sum(BookActivity.rating_count),
+                func.sum(BookActivity.rating_sum),
+            )
+            .where(BookActivity.day > expired_through, BookActivity.day <= cutoff)
+            .group_by(BookActivity.book_id)
+        ).all()
+        if aged:
+            db.session.execute(
+                take_back,
+                [
+                    {
+                        "entry_period": period,
+                        "entry_book_id": book_id,
+                        "aged_borrows": borrows,
+                        "aged_count": count,
+                        "aged_sum": total,
+                    }
+                    for book_id, borrows, count, total in aged
+                ],
+            )
+            db.session.execute(
+                delete(LeaderboardEntry).where(
+                    LeaderboardEntry.period == period,
+                    LeaderboardEntry.borrows <= 0,
+                    LeaderboardEntry.rating_count <= 0,
+                )
+            )
+    if moved:
+        # Every window has now let go of these days.
+        db.session.execute(delete(BookActivity).where(BookActivity.day <= today - timedelta(days=HISTORY_DAYS)))
+    return moved
+
+
+def compact(today: date | None = None) -> None:
+    """Rebuild the windowed boards from recent activity, repairing any drift."""
+    _rebuild_windows(today or date.today())
+    db.session.commit()
+
+
+def resync_all_time() -> None:
+    """Recount the all-time boards and their categories from every approved loan and the books' ratings."""
+    db.session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.period == "all"))
+    borrows = (
+        select(Booking.book_id, func.count().label("borrows"))
+        .where(Booking.approved.is_(True))
+        .group_by(Booking.book_id)
+        .subquery()
+    )
+    borrowed = func.coalesce(borrows.c.borrows, 0)
+    source = (
+        select(
+            literal("all"), Book.id, Book.category_id, borrowed, Book.rating_count, Book.rating_sum,
+            rating_score(Book.rating_sum, Book.rating_count),
+        )
+        .outerjoin(borrows, borrows.c.book_id == Book.id)
+        .where((borrowed > 0) | (Book.rating_count > 0))
+    )
+    db.session.execute(insert(LeaderboardEntry).from_select(ENTRY_COLUMNS, source))
+    db.session.commit()
+
+
+def rebuild(today: date | None = None) -> None:
+    """Recreate recent activity from loan and rating history, then rebuild every board.
+
+    For databases that predate the leaderboards, or after bulk loads that
+    bypass the write paths. Loans count on their start date, since the day
+    they were approved isn't stored.
+    """
+    today = today or date.today()
+    since = today - timedelta(days=HISTORY_DAYS - 1)
+    db.session.execute(delete(BookActivity))
+    db.session.execute(delete(LeaderboardEntry))
+    day = func.date(Rating.created_at)
+    loans = db.session.execute(
+        select(Booking.book_id, Booking.start_date, func.count())
+        .where(Booking.approved.is_(True), Booking.start_date >= since, Booking.start_date <= today)
+        .group_by(Booking.book_id, Booking.start_date)
+    )
+    ratings = db.session.execute(
+        select(Rating.book_id, day, func.count(), func.sum(Rating.score))
+        .where(Rating.created_at >= since)
+        .group_by(Rating.book_id, day)
+    )
+    activity = [
+        {"book_id": book_id, "day": started, "borrows": count, "rating_count": 0, "rating_sum": 0}
+        for book_id, started, count in loans
+    ]
+    _add(BookActivity, ["book_id", "day"], activity)
+    _add(
+        BookActivity,
+        ["book_id", "day"],
+        [
+            {"book_id": book_id, "day": _as_date(given), "borrows": 0, "rating_count": count, "rating_sum": total}
+            for book_id, given, count, total in ratings
+        ],
+    )
+    compact(today)
+    resync_all_time()
+
+
+def start_scheduler(app: Flask) -> threading.Thread | None:
+    """Run ``compact`` every ``LEADERBOARD_COMPACT_INTERVAL`` seconds in a daemon thread.
+
+    Off by default: boards age out on their own (see ``expire``), so this is only a drift repair.
+    """
+    return start_periodic(app, "leaderboard-compaction", app.config.get("LEADERBOARD_COMPACT_INTERVAL", 0), compact)
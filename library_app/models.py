@@ -1,8 +1,9 @@
 from datetime import datetime
 
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.security import check_password_hash
 
 from . import db
+from .passwords import hash_password
 
 
 class TimestampMixin:
@@ -12,6 +13,10 @@ class TimestampMixin:
 
 class User(TimestampMixin, db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        # Pending-approval counts on the admin dashboard.
+        db.Index("ix_users_role_approved", "role", "approved"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -22,9 +27,11 @@ class User(TimestampMixin, db.Model):
 
     bookings = db.relationship("Booking", back_populates="user", cascade="all, delete-orphan")
     ratings = db.relationship("Rating", back_populates="user", cascade="all, delete-orphan")
+    holds = db.relationship("Hold", back_populates="user", cascade="all, delete-orphan")
+    recommendations = db.relationship("Recommendation", back_populates="user", cascade="all, delete-orphan")
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
@@ -47,6 +54,10 @@ class Category(db.Model):
 
 class Book(TimestampMixin, db.Model):
     __tablename__ = "books"
+    __table_args__ = (
+        db.Index("ix_books_category_id", "category_id"),
+        db.Index("ix_books_created_at", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -55,17 +66,29 @@ class Book(TimestampMixin, db.Model):
     description = db.Column(db.Text)
     copies_total = db.Column(db.Integer, default=1)
     copies_available = db.Column(db.Integer, default=1)
+    # Maintained alongside every Rating write so the catalog never loads the ratings collection.
+    rating_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
 
     category_id = db.Column(db.Integer, db.ForeignKey("categories.id"))
     category = db.relationship("Category", back_populates="books")
 
     bookings = db.relationship("Booking", back_populates="book", cascade="all, delete-orphan")
     ratings = db.relationship("Rating", back_populates="book", cascade="all, delete-orphan")
+    holds = db.relationship("Hold", back_populates="book", cascade="all, delete-orphan")
+    recommendations = db.relationship("Recommendation", back_populates="book", cascade="all, delete-orphan")
+    activity = db.relationship("BookActivity", cascade="all, delete-orphan")
+    leaderboard_entries = db.relationship("LeaderboardEntry", cascade="all, delete-orphan")
+
+    def record_rating(self, score: int) -> None:
+        # SQL expressions turn this into an in-place UPDATE, so concurrent raters can't lose increments.
+        self.rating_count = Book.rating_count + 1
+        self.rating_sum = Book.rating_sum + score
 
     def average_rating(self) -> float:
-        if not self.ratings:
+        if not self.rating_count:
             return 0
-        return round(sum(r.score for r in self.ratings) / len(self.ratings), 2)
+        return round(self.rating_sum / self.rating_count, 2)
 
     def __repr__(self) -> str:  # pragma: no cover
         return f"<Book {self.title}>"
@@ -73,6 +96,18 @@ class Book(TimestampMixin, db.Model):
 
 class Booking(TimestampMixin, db.Model):
     __tablename__ = "bookings"
+    __table_args__ = (
+        # Dashboard counters and the "active loans" list filter on approval/return state.
+        db.Index("ix_bookings_approved_returned_start", "approved", "returned", "start_date"),
+        # Member portal (open bookings) and member bookings list, newest first.
+        db.Index("ix_bookings_user_returned_start", "user_id", "returned", "start_date"),
+        db.Index("ix_bookings_user_start", "user_id", "start_date"),
+        # Availability: loans of one book overlapping a date range (also serves book_id lookups).
+        db.Index("ix_bookings_book_start_end", "book_id", "start_date", "end_date"),
+        db.Index("ix_bookings_start_date", "start_date"),
+        # Overdue sweep: open approved loans past their end date.
+        db.Index("ix_bookings_approved_returned_end", "approved", "returned", "end_date"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -91,6 +126,11 @@ class Booking(TimestampMixin, db.Model):
 
 class Rating(TimestampMixin, db.Model):
     __tablename__ = "ratings"
+    __table_args__ = (
+        db.Index("ix_ratings_user_created", "user_id", "created_at"),
+        db.Index("ix_ratings_book_created", "book_id", "created_at"),
+        db.Index("ix_ratings_created_at", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     score = db.Column(db.Integer, nullable=False)
@@ -100,3 +140,122 @@ class Rating(TimestampMixin, db.Model):
 
     user = db.relationship("User", back_populates="ratings")
     book = db.relationship("Book", back_populates="ratings")
+
+
+class Hold(db.Model):
+    """A member's place in a book's waitlist; lower ids are served first."""
+
+    __tablename__ = "holds"
+    __table_args__ = (
+        db.UniqueConstraint("book_id", "user_id", name="uq_holds_book_user"),
+        # Next holder for a book, and queue positions: seek by book, walk in id order.
+        db.Index("ix_holds_book_id_id", "book_id", "id"),
+        db.Index("ix_holds_user_id", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey("books.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship("User", back_populates="holds")
+    book = db.relationship("Book", back_populates="holds")
+
+
+class Recommendation(db.Model):
+    """A precomputed suggestion for a member, written by ``flask build-recommendations``."""
+
+    __tablename__ = "recommendations"
+    __table_args__ = (
+        # Member dashboard: one seek by member, already in rank order.
+        db.Index("ix_recommendations_user_rank", "user_id", "rank"),
+        db.Index("ix_recommendations_book_id", "book_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    book_id = db.Column(db.Integer, db.ForeignKey("books.id"), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship("User", back_populates="recommendations")
+    book = db.relationship("Book", back_populates="recommendations")
+
+
+class BookActivity(db.Model):
+    """Loans and ratings per book per day; the windowed boards subtract days as they age out of them."""
+
+    __tablename__ = "book_activity"
+    __table_args__ = (db.Index("ix_book_activity_day", "day"),)
+
+    book_id = db.Column(db.Integer, db.ForeignKey("books.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    borrows = db.Column(db.Integer, default=0, nullable=False)
+    rating_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+
+
+class LeaderboardEntry(db.Model):
+    """A book's standing over one period ("7d", "30d" or "all"), kept current by ``leaderboards.record``."""
+
+    __tablename__ = "leaderboard_entries"
+    __table_args__ = (
+        # One board = one index walk: period (+ category), best first, book_id breaking ties.
+        db.Index("ix_leaderboard_period_borrows", "period", "borrows", "book_id"),
+        db.Index("ix_leaderboard_period_score", "period", "rating_score", "book_id"),
+        db.Index("ix_leaderboard_period_category_borrows", "period", "category_id", "borrows", "book_id"),
+        db.Index("ix_leaderboard_period_category_score", "period", "category_id", "rating_score", "book_id"),
+        db.Index("ix_leaderboard_book_id", "book_id"),
+    )
+
+    period = db.Column(db.String(8), primary_key=True)
+    book_id = db.Column(db.Integer, db.ForeignKey("books.id"), primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey("categories.id"))
+    borrows = db.Column(db.Integer, default=0, nullable=False)
+    rating_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    rating_score = db.Column(db.Float, default=0, nullable=False)
+
+
+class LeaderboardWindow(db.Model):
+    """How far a windowed board ("7d", "30d") has had aged-out activity taken back out of it."""
+
+    __tablename__ = "leaderboard_windows"
+
+    period = db.Column(db.String(8), primary_key=True)
+    # Activity on this day and earlier is no longer counted in the board.
+    expired_through = db.Column(db.Date, nullable=False)
+
+
+class CirculationEvent(db.Model):
+    """One booking state change. Rows are only ever appended; see ``events.py``."""
+
+    __tablename__ = "circulation_events"
+    __table_args__ = (
+        # Replay: a booking's events, and per-book approvals/returns.
+        db.Index("ix_circulation_events_booking_id", "booking_id", "id"),
+        db.Index("ix_circulation_events_book_kind", "book_id", "kind"),
+        db.Index("ix_circulation_events_created_at", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign keys: the log outlives deleted bookings and books.
+    booking_id = db.Column(db.Integer, nullable=False)
+    book_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class OverdueSummary(db.Model):
+    """One row per overdue sweep; dashboards read the latest."""
+
+    __tablename__ = "overdue_summaries"
+
+    id = db.Column(db.Integer, primary_key=True)
+    as_of = db.Column(db.Date, nullable=False)
+    overdue_loans = db.Column(db.Integer, default=0, nullable=False)
+    outstanding_fines = db.Column(db.Integer, default=0, nullable=False)
+    members_affected = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
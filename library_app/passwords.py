@@ -0,0 +1,107 @@
+"""Password hashing with configurable cost, bounded verification and login throttling.
+
+``PASSWORD_HASH_METHOD`` is any werkzeug method string (``scrypt:32768:8:1``,
+``pbkdf2:sha256:600000``, ...). A successful login whose stored hash used
+other parameters is re-hashed on the spot, so a cost change rolls out as
+members sign in.
+
+Hashing runs on a small per-process thread pool. hashlib's scrypt and pbkdf2
+release the GIL, so the pool size caps how many cores a login storm can
+take, and ``PASSWORD_VERIFY_QUEUE`` caps how many logins may wait for it;
+past that, logins are turned away at once instead of tying up workers that
+catalog requests need. Failed attempts are counted per email in the app
+cache, so with the shared cache backend the limit holds across workers.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from . import cache
+
+
+class VerifierBusy(Exception):
+    """Every verification slot is taken; the caller should ask the user to retry."""
+
+
+class VerifyPool:
+    def __init__(self, workers: int, capacity: int) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self.slots = threading.BoundedSemaphore(capacity)
+
+    def run(self, func, *args):
+        if not self.slots.acquire(blocking=False):
+            raise VerifierBusy()
+        try:
+            return self.executor.submit(func, *args).result()
+        finally:
+            self.slots.release()
+
+
+def get_pool() -> VerifyPool:
+    pool = current_app.extensions.get("password_pool")
+    if pool is None:
+        pool = current_app.extensions["password_pool"] = VerifyPool(
+            current_app.config.get("PASSWORD_VERIFY_WORKERS", 2),
+            current_app.config.get("PASSWORD_VERIFY_QUEUE", 32),
+        )
+    return pool
+
+
+def hash_method() -> str:
+    if not has_app_context():
+        return "scrypt"
+    return current_app.config.get("PASSWORD_HASH_METHOD", "scrypt")
+
+
+@lru_cache(maxsize=8)
+def _canonical(method: str) -> str:
+    # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1"); hash once to learn them.
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def hash_password(password: str) -> str:
+    return generate_password_hash(password, method=hash_method())
+
+
+def needs_rehash(password_hash: str) -> bool:
+    return password_hash.split("$", 1)[0] != _canonical(hash_method())
+
+
+def verify(password_hash: str, password: str) -> bool:
+    """Check ``password`` on the hashing pool; raises ``VerifierBusy`` when it is saturated."""
+    return get_pool().run(check_password_hash, password_hash, password)
+
+
+def rehash(password: str) -> str:
+    return get_pool().run(generate_password_hash, password, hash_method())
+
+
+def _failures_key(email: str) -> str:
+    return f"login-failures:{email.strip().lower()}"
+
+
+def throttled(email: str) -> bool:
+    limit = current_app.config.get("LOGIN_FAILURE_LIMIT", 0)
+    if not limit:
+        return False
+    entry = cache.get(_failures_key(email))
+    return bool(entry) and entry[0] >= limit
+
+
+def record_failure(email: str) -> None:
+    window = current_app.config.get("LOGIN_FAILURE_WINDOW", 0)
+    if not window:
+        return
+    # Fixed window from the first failure; read-modify-write, so concurrent misses may undercount by one.
+    count, started = cache.get(_failures_key(email)) or (0, time.time())
+    remaining = window - (time.time() - started)
+    if remaining > 0:
+        cache.set(_failures_key(email), (count + 1, started), remaining)
+
+
+def clear_failures(email: str) -> None:
+    cache.delete(_failures_key(email))
@@ -0,0 +1,139 @@
+"""Opt-in per-request SQL profiling.
+
+With ``QUERY_PROFILING`` enabled, SQLAlchemy cursor events count statements
+and time them, and Flask's request signals fold the totals into per-endpoint
+stats. Each response carries a ``Server-Timing`` header, the librarian
+``/admin/perf`` page shows the aggregates, and requests over
+``PERF_QUERY_BUDGET`` or ``PERF_LATENCY_BUDGET_MS`` are logged.
+"""
+import heapq
+import threading
+import time
+
+from flask import Flask, current_app, g, has_request_context, request, request_finished, request_started
+from sqlalchemy import event
+
+from . import db
+
+
+class EndpointStats:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.max_queries = 0
+        # Min-heap of (ms, statement) so the fastest of the kept statements is evicted first.
+        self.slowest: list[tuple[float, str]] = []
+
+    def add(self, queries: int, db_ms: float, total_ms: float, statements: list, keep: int) -> None:
+        self.requests += 1
+        self.queries += queries
+        self.db_ms += db_ms
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.max_queries = max(self.max_queries, queries)
+        for entry in statements:
+            if len(self.slowest) < keep:
+                heapq.heappush(self.slowest, entry)
+            elif entry[0] > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+
+class QueryProfiler:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.endpoints: dict[str, EndpointStats] = {}
+
+    def record(self, endpoint: str, queries: int, db_ms: float, total_ms: float, statements: list, keep: int) -> None:
+        with self.lock:
+            self.endpoints.setdefault(endpoint, EndpointStats()).add(queries, db_ms, total_ms, statements, keep)
+
+    def snapshot(self) -> list[dict]:
+        with self.lock:
+            rows = [
+                {
+                    "endpoint": endpoint,
+                    "requests": stats.requests,
+                    "avg_queries": stats.queries / stats.requests,
+                    "max_queries": stats.max_queries,
+                    "avg_db_ms": stats.db_ms / stats.requests,
+                    "avg_ms": stats.total_ms / stats.requests,
+                    "max_ms": stats.max_ms,
+                    "total_db_ms": stats.db_ms,
+                    "slowest": sorted(stats.slowest, reverse=True),
+                }
+                for endpoint, stats in self.endpoints.items()
+            ]
+        return sorted(rows, key=lambda row: row["total_db_ms"], reverse=True)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints.clear()
+
+
+def get_profiler() -> QueryProfiler | None:
+    return current_app.extensions.get("query_profiler")
+
+
+# The start time lives on the statement's execution context rather than a per-connection stack,
+# so a statement that raises (e.g. a lock error before a retry) can't pair later timings with it.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "query_started", None)
+    if started is None or not has_request_context() or "perf" not in g:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    g.perf["queries"] += 1
+    g.perf["db_ms"] += elapsed_ms
+    g.perf["statements"].append((elapsed_ms, statement))
+
+
+def _request_started(app: Flask, **extra) -> None:
+    g.perf = {"started": time.perf_counter(), "queries": 0, "db_ms": 0.0, "statements": []}
+
+
+def _request_finished(app: Flask, response, **extra) -> None:
+    perf = g.pop("perf", None)
+    if perf is None:
+        return
+    total_ms = (time.perf_counter() - perf["started"]) * 1000
+    endpoint = request.endpoint or "<unmatched>"
+    keep = app.config.get("PERF_SLOWEST_KEPT", 5)
+    slowest = heapq.nlargest(keep, perf["statements"])
+    app.extensions["query_profiler"].record(endpoint, perf["queries"], perf["db_ms"], total_ms, slowest, keep)
+
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={perf["db_ms"]:.2f};desc="{perf["queries"]} queries", app;dur={total_ms:.2f}',
+    )
+
+    query_budget = app.config.get("PERF_QUERY_BUDGET", 0)
+    latency_budget = app.config.get("PERF_LATENCY_BUDGET_MS", 0)
+    if (query_budget and perf["queries"] > query_budget) or (latency_budget and total_ms > latency_budget):
+        app.logger.warning(
+            "Over budget: %s %s took %.1f ms with %d queries (%.1f ms in the database); slowest: %s",
+            request.method,
+            request.path,
+            total_ms,
+            perf["queries"],
+            perf["db_ms"],
+            slowest[0][1] if slowest else "-",
+        )
+
+
+def init_app(app: Flask) -> None:
+    if not app.config.get("QUERY_PROFILING"):
+        return
+    app.extensions["query_profiler"] = QueryProfiler()
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    request_started.connect(_request_started, app)
+    request_finished.connect(_request_finished, app)
@@ -0,0 +1,106 @@
+"""EXPLAIN QUERY PLAN regression check for the hot dashboard and list queries.
+
+Each entry mirrors a query issued by a view in ``routes.py``. ``flask
+check-query-plans`` fails if SQLite answers any of them with a full table
+scan or a temp B-tree sort, which means an index has gone missing or stopped
+matching the predicate.
+"""
+from datetime import date, datetime
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import joinedload
+
+from . import db
+from . import leaderboards
+from .models import Book, Booking, Rating, Recommendation, User
+from .routes import seek_after
+
+# Unfiltered "newest N" queries are expected to walk an index in order and stop at LIMIT.
+ORDERED_WALKS = {"admin_portal: recent books"}
+
+
+def hot_queries() -> dict:
+    # Placeholder ids/dates: the plan depends on the predicate shape, not the values.
+    user_id, book_id, category_id = 1, 1, 1
+    cursor_day, cursor_time = date.today(), datetime.utcnow()
+    return {
+        "admin_portal: pending users": User.query.filter_by(role="member", approved=False)
+        .with_entities(db.func.count()),
+        "admin_portal: pending bookings": Booking.query.filter_by(approved=False)
+        .with_entities(db.func.count()),
+        "admin_portal: active loans": Booking.query.filter_by(returned=False, approved=True)
+        .options(joinedload(Booking.book), joinedload(Booking.user))
+        .order_by(Booking.start_date.desc())
+        .limit(5),
+        "admin_portal: recent books": Book.query.order_by(Book.created_at.desc()).limit(5),
+        "member_portal: open bookings": Booking.query.filter_by(user_id=user_id, returned=False)
+        .options(joinedload(Booking.book))
+        .order_by(Booking.start_date.desc())
+        .limit(5),
+        "member_portal: recent ratings": Rating.query.filter_by(user_id=user_id)
+        .options(joinedload(Rating.book))
+        .order_by(Rating.created_at.desc())
+        .limit(3),
+        "member_bookings: next page": Booking.query.filter_by(user_id=user_id)
+        .filter(seek_after([Booking.start_date, Booking.id], [cursor_day, 1], descending=True))
+        .order_by(Booking.start_date.desc(), Booking.id.desc())
+        .limit(51),
+        "member_ratings: next page": Rating.query.filter_by(user_id=user_id)
+        .filter(seek_after([Rating.created_at, Rating.id], [cursor_time, 1], descending=True))
+        .order_by(Rating.created_at.desc(), Rating.id.desc())
+        .limit(51),
+        "member_book_reviews": Rating.query.filter_by(book_id=book_id).order_by(Rating.created_at.desc()),
+        "bookings: next page": Booking.query.filter(
+            seek_after([Booking.start_date, Booking.id], [cursor_day, 1], descending=True)
+        )
+        .order_by(Booking.start_date.desc(), Booking.id.desc())
+        .limit(51),
+        "ratings: next page": Rating.query.filter(
+            seek_after([Rating.created_at, Rating.id], [cursor_time, 1], descending=True)
+        )
+        .order_by(Rating.created_at.desc(), Rating.id.desc())
+        .limit(51),
+        "book_availability: loans overlapping a range": Booking.query.filter(
+            Booking.book_id == book_id,
+            Booking.start_date <= cursor_day,
+            Booking.end_date >= cursor_day,
+            Booking.approved.is_(True),
+            Booking.returned.is_not(True),
+        ).with_entities(Booking.start_date, Booking.end_date),
+        "member_portal: recommendations": Recommendation.query.filter_by(user_id=user_id)
+        .options(joinedload(Recommendation.book))
+        .order_by(Recommendation.rank)
+        .limit(4),
+        "leaderboards: most borrowed": leaderboards.board_query("borrowed", "30d"),
+        "leaderboards: top rated in category": leaderboards.board_query("rated", "30d", category_id),
+        "books: category filter": Book.query.filter_by(category_id=category_id)
+        .filter(seek_after([Book.id], [1], descending=False))
+        .order_by(Book.id)
+        .limit(51),
+    }
+
+
+def explain(query) -> list[str]:
+    compiled = query.statement.compile(dialect=sqlite.dialect(paramstyle="named"))
+    statement = text(f"EXPLAIN QUERY PLAN {compiled}").bindparams(
+        *(bindparam(name, value, type_=compiled.binds[name].type) for name, value in compiled.params.items())
+    )
+    return [row[3] for row in db.session.execute(statement)]
+
+
+def _is_problem(name: str, step: str) -> bool:
+    if "USE TEMP B-TREE FOR ORDER BY" in step:
+        return True
+    if not step.startswith("SCAN"):
+        return False
+    return not (name in ORDERED_WALKS and "INDEX" in step)
+
+
+def check_query_plans() -> dict[str, tuple[list[str], list[str]]]:
+    """Return ``{name: (plan, problems)}`` for every hot query."""
+    report = {}
+    for name, query in hot_queries().items():
+        plan = explain(query)
+        report[name] = (plan, [step for step in plan if _is_problem(name, step)])
+    return report
@@ -1,52 +1,209 @@
-from datetime import date, timedelta
+import base64
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    flash,
+    g,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_with_context,
+    url_for,
+)
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, joinedload
+from werkzeug.local import LocalProxy
+
+from . import analytics, availability, cache, db, events, exports, fragments, inventory, leaderboards, passwords, profiling, search
+from .models import Book, Booking, Category, Hold, OverdueSummary, Rating, Recommendation, User
 
-from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+bp = Blueprint("library", __name__)
 
-from . import db
-from .models import Book, Booking, Category, Rating, User
 
-bp = Blueprint("library", __name__)
+# "access:<user_id>" -> (role, approved). With the per-process memory backend the TTL bounds
+# how long another worker can keep honouring a role or approval that has since changed.
+def remember_access(user: User) -> None:
+    cache.set(
+        f"access:{user.id}",
+        (user.role, bool(user.approved)),
+        current_app.config.get("USER_ACCESS_CACHE_TTL", 0),
+    )
+
+
+def forget_access(user_id: int) -> None:
+    cache.delete(f"access:{user_id}")
 
 
 def current_user() -> User | None:
     user_id = session.get("user_id")
     if not user_id:
         return None
-    return User.query.get(user_id)
+    # Resolved at most once per request; every helper below shares this lookup.
+    if g.get("current_user_id") != user_id:
+        g.current_user = db.session.get(User, user_id)
+        g.current_user_id = user_id
+    return g.current_user
 
 
-def current_role() -> str | None:
+def current_access() -> tuple[str, bool] | None:
+    """Return ``(role, approved)`` for the signed-in user, from the TTL cache when possible."""
+    user_id = session.get("user_id")
+    if not user_id:
+        return None
+    cached = cache.get(f"access:{user_id}")
+    if cached:
+        return cached
+
     user = current_user()
-    if user:
-        return user.role
+    if not user:
+        forget_access(user_id)
+        return None
+    remember_access(user)
+    return user.role, bool(user.approved)
+
+
+def current_role() -> str | None:
+    access = current_access()
+    if access:
+        return access[0]
     return None
 
 
 def current_member() -> User | None:
-    user = current_user()
-    if not user or user.role != "member":
+    if current_role() != "member":
         return None
-    return user
+    return current_user()
 
 
 def require_role(role: str):
-    user = current_user()
-    if not user or user.role != role:
+    access = current_access()
+    if not access or access[0] != role:
         flash("Please log in to access that portal.", "warning")
         return redirect(url_for("library.login", next=request.path))
-    if not user.approved:
+    if not access[1]:
+        forget_access(session["user_id"])
         session.clear()
         flash("Your account is awaiting librarian approval.", "warning")
         return redirect(url_for("library.login"))
+    # Member views go on to load the user anyway (once per request, via current_user), so check
+    # the row here: another worker's cached access can outlive a deleted account for up to the TTL.
+    if role == "member" and current_user() is None:
+        forget_access(session["user_id"])
+        session.clear()
+        flash("Please log in to access that portal.", "warning")
+        return redirect(url_for("library.login"))
     return None
 
 
+def release_user_ratings(user: User) -> None:
+    """Take a user's ratings back out of the per-book aggregates before they cascade away."""
+    leaderboards.remove_user_ratings(user.id)
+    totals = (
+        db.session.query(Rating.book_id, func.count(Rating.id), func.sum(Rating.score))
+        .filter(Rating.user_id == user.id)
+        .group_by(Rating.book_id)
+    )
+    for book_id, count, score_sum in totals:
+        Book.query.filter_by(id=book_id).update(
+            {
+                Book.rating_count: Book.rating_count - count,
+                Book.rating_sum: Book.rating_sum - score_sum,
+            },
+            synchronize_session=False,
+        )
+
+
+# Any committed write drops the snapshot, so with the memory backend the TTL only
+# bounds staleness from writes made by other worker processes.
+def invalidate_dashboard() -> None:
+    cache.delete("dashboard")
+
+
+def count_of(model, **criteria):
+    return select(func.count()).select_from(model).filter_by(**criteria).scalar_subquery()
+
+
+def latest_summary(column):
+    return select(column).order_by(OverdueSummary.id.desc()).limit(1).scalar_subquery()
+
+
+def dashboard_snapshot() -> dict:
+    """Counters and short lists for the librarian dashboard, as plain data that can be cached."""
+    cached = cache.get("dashboard")
+    if cached is not None:
+        return cached
+
+    # Every counter in one statement instead of six COUNT(*) round-trips.
+    counts = db.session.execute(
+        select(
+            count_of(User, role="member", approved=False).label("pending_users"),
+            count_of(Booking, approved=False).label("pending_bookings"),
+            count_of(Book).label("book_count"),
+            count_of(User).label("user_count"),
+            count_of(Booking).label("booking_count"),
+            count_of(Rating).label("rating_count"),
+            latest_summary(OverdueSummary.overdue_loans).label("overdue_loans"),
+            latest_summary(OverdueSummary.outstanding_fines).label("outstanding_fines"),
+        )
+    ).one()._asdict()
+
+    recent_books = [
+        {"title": book.title, "author": book.author, "created_at": book.created_at}
+        for book in Book.query.order_by(Book.created_at.desc()).limit(5)
+    ]
+    active_bookings = [
+        {
+            "id": booking.id,
+            "end_date": booking.end_date,
+            "return_requested": booking.return_requested,
+            "book": {"title": booking.book.title},
+            "user": {"name": booking.user.name},
+        }
+        for booking in (
+            Booking.query.filter_by(returned=False, approved=True)
+            .options(joinedload(Booking.book), joinedload(Booking.user))
+            .order_by(Booking.start_date.desc())
+            .limit(5)
+        )
+    ]
+
+    popular = {
+        metric: [
+            {
+                "title": book.title,
+                "author": book.author,
+                "borrows": entry.borrows,
+                "rating": entry.rating_sum / entry.rating_count if entry.rating_count else 0,
+            }
+            for book, entry in leaderboards.top(metric, "30d")
+        ]
+        for metric in leaderboards.METRICS
+    }
+
+    snapshot = {
+        **counts,
+        "recent_books": recent_books,
+        "active_bookings": active_bookings,
+        "popular": popular,
+    }
+    cache.set("dashboard", snapshot, current_app.config.get("DASHBOARD_CACHE_TTL", 0))
+    return snapshot
+
+
 @bp.app_context_processor
 def inject_globals():
+    # Proxies defer the User lookup until a template actually touches them.
     return {
         "active_role": current_role(),
-        "active_member": current_member(),
-        "active_user": current_user(),
+        "active_member": LocalProxy(current_member),
+        "active_user": LocalProxy(current_user),
     }
 
 
@@ -57,6 +214,90 @@ def get_form_value(field_name: str, cast=str, default=None):
     return cast(value)
 
 
+PAGE_SIZE = 50
+
+
+class Page(NamedTuple):
+    items: list
+    next_cursor: str | None
+
+
+def encode_cursor(values: list) -> str:
+    raw = ",".join(v.isoformat() if hasattr(v, "isoformat") else str(v) for v in values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None, key_columns: list) -> list | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        parts = raw.split(",")
+        if len(parts) != len(key_columns):
+            return None
+        values = []
+        for column, part in zip(key_columns, parts):
+            python_type = column.type.python_type
+            if python_type in (date, datetime):
+                values.append(python_type.fromisoformat(part))
+            else:
+                values.append(python_type(part))
+        return values
+    except (ValueError, UnicodeDecodeError, NotImplementedError):
+        # A stale or hand-edited cursor just restarts from the first page.
+        return None
+
+
+def seek_after(key_columns: list, values: list, descending: bool):
+    """Build ``(a, b) > (va, vb)`` as OR/AND terms so every backend can use the index."""
+    column, value = key_columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(key_columns) == 1:
+        return beyond
+    # The redundant leading bound gives the planner a range to seek to; the OR alone
+    # makes SQLite walk the index from the start and filter.
+    bound = column <= value if descending else column >= value
+    return and_(bound, or_(beyond, and_(column == value, seek_after(key_columns[1:], values[1:], descending))))
+
+
+def paginate(query, model, sort_column=None, descending: bool = False, per_page: int = PAGE_SIZE) -> Page:
+    """Return one keyset page of ``query`` ordered by ``(sort_column, id)``.
+
+    The position is carried in the ``after`` query argument, so fetching page N
+    costs the same index seek as page 1 instead of an ever-growing OFFSET scan.
+    """
+    key_columns = [model.id] if sort_column is None else [sort_column, model.id]
+    values = decode_cursor(request.args.get("after"), key_columns)
+    if values:
+        query = query.filter(seek_after(key_columns, values, descending))
+
+    ordering = [column.desc() if descending else column.asc() for column in key_columns]
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+    if len(rows) <= per_page:
+        return Page(rows, None)
+
+    rows = rows[:per_page]
+    return Page(rows, encode_cursor([getattr(rows[-1], column.key) for column in key_columns]))
+
+
+@bp.app_template_global()
+def page_url(cursor: str | None = None) -> str:
+    # Keep the current filters (e.g. ?category=) when moving between pages.
+    args = {key: value for key, value in request.args.items() if key != "after"}
+    if cursor:
+        args["after"] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def count_by(column, ids: list) -> dict:
+    """Grouped COUNT(*) for just the ids on the current page."""
+    if not ids:
+        return {}
+    return dict(
+        db.session.query(column, func.count()).filter(column.in_(ids)).group_by(column).all()
+    )
+
+
 @bp.route("/")
 def index():
     # First touch should land on auth; if already signed in, route to the right portal.
@@ -92,6 +333,7 @@ def login():
             user.set_password(password)
             db.session.add(user)
             db.session.commit()
+            invalidate_dashboard()
             flash("Registration submitted. A librarian must approve your account.", "success")
             return redirect(url_for("library.login"))
 
@@ -102,10 +344,24 @@ def login():
             flash("Enter both email and password to sign in.", "warning")
             return redirect(url_for("library.login"))
 
+        if passwords.throttled(email):
+            flash("Too many failed sign-in attempts for this email. Try again in a few minutes.", "danger")
+            return redirect(url_for("library.login"))
+
         user = User.query.filter_by(email=email).first()
-        if not user or not user.check_password(password):
+        try:
+            valid = user is not None and passwords.verify(user.password_hash, password)
+            if valid and passwords.needs_rehash(user.password_hash):
+                user.password_hash = passwords.rehash(password)
+                db.session.commit()
+        except passwords.VerifierBusy:
+            flash("Sign-in is very busy right now. Please try again in a moment.", "warning")
+            return redirect(url_for("library.login"))
+        if not valid:
+            passwords.record_failure(email)
             flash("Invalid credentials. Please try again.", "danger")
             return redirect(url_for("library.login"))
+        passwords.clear_failures(email)
 
         if not user.approved:
             flash("Your account is awaiting librarian approval.", "warning")
@@ -114,6 +370,7 @@ def login():
         session.clear()
         session["role"] = user.role
         session["user_id"] = user.id
+        remember_access(user)
         flash("Welcome back!", "success")
         next_page = request.args.get("next")
         if user.role == "librarian":
@@ -136,30 +393,97 @@ def admin_portal():
     if redirect_response:
         return redirect_response
 
-    pending_users = User.query.filter_by(role="member", approved=False).count()
-    pending_bookings = Booking.query.filter_by(approved=False).count()
-    book_count = Book.query.count()
-    user_count = User.query.count()
-    booking_count = Booking.query.count()
-    rating_count = Rating.query.count()
+    return render_template("admin/dashboard.html", **dashboard_snapshot())
 
-    recent_books = Book.query.order_by(Book.created_at.desc()).limit(5)
-    active_bookings = (
-        Booking.query.filter_by(returned=False, approved=True)
-        .order_by(Booking.start_date.desc())
-        .limit(5)
+
+@bp.route("/admin/perf", methods=["GET", "POST"])
+def admin_perf():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    profiler = profiling.get_profiler()
+    if request.method == "POST" and profiler:
+        profiler.reset()
+        flash("Profiling stats cleared.", "info")
+        return redirect(url_for("library.admin_perf"))
+
+    return render_template(
+        "admin/perf.html",
+        enabled=profiler is not None,
+        endpoints=profiler.snapshot() if profiler else [],
     )
 
+
+ANALYTICS_WINDOWS = {30: "Last 30 days", 90: "Last 90 days", 365: "Last year", 0: "All time"}
+
+
+def analytics_window() -> int:
+    days = request.args.get("days", 30, type=int)
+    return days if days in ANALYTICS_WINDOWS else 30
+
+
+@bp.route("/admin/analytics")
+def admin_analytics():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    days = analytics_window()
+    stats = analytics.circulation_stats(days)
     return render_template(
-        "admin/dashboard.html",
-        book_count=book_count,
-        user_count=user_count,
-        booking_count=booking_count,
-        rating_count=rating_count,
-        recent_books=recent_books,
-        active_bookings=active_bookings,
-        pending_users=pending_users,
-        pending_bookings=pending_bookings,
+        "admin/analytics.html",
+        stats=stats,
+        days=days,
+        windows=ANALYTICS_WINDOWS,
+        busiest_day=max((point["loans"] for point in stats["loans_per_day"]), default=0),
+    )
+
+
+@bp.route("/admin/analytics.json")
+def admin_analytics_feed():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    return jsonify(analytics.circulation_stats(analytics_window()))
+
+
+@bp.route("/admin/exports")
+def admin_exports():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    return render_template(
+        "admin/exports.html",
+        kinds=exports.EXPORTS,
+        statuses=exports.STATUSES,
+        formats=exports.FORMATS,
+    )
+
+
+@bp.route("/admin/exports/<kind>")
+def export_data(kind: str):
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    fmt = request.args.get("format", "csv")
+    if kind not in exports.EXPORTS or fmt not in exports.FORMATS:
+        flash("Unknown export.", "warning")
+        return redirect(url_for("library.admin_exports"))
+    try:
+        filters = exports.parse_filters(request.args, kind)
+    except ValueError as exc:
+        flash(f"Invalid export filter: {exc}", "warning")
+        return redirect(url_for("library.admin_exports"))
+
+    # Rows are pulled from the database as the client reads, a batch at a time.
+    return Response(
+        stream_with_context(exports.iter_export(kind, fmt, filters)),
+        mimetype=exports.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{kind}-{date.today().isoformat()}.{fmt}"'},
     )
 
 
@@ -172,15 +496,26 @@ def member_portal():
     member = current_member()
     open_bookings = (
         Booking.query.filter_by(user_id=member.id, returned=False)
+        .options(joinedload(Booking.book))
         .order_by(Booking.start_date.desc())
         .limit(5)
     )
     recent_ratings = (
         Rating.query.filter_by(user_id=member.id)
+        .options(joinedload(Rating.book))
         .order_by(Rating.created_at.desc())
         .limit(3)
     )
-    suggested_books = Book.query.order_by(Book.created_at.desc()).limit(4)
+    suggested_books = [
+        recommendation.book
+        for recommendation in Recommendation.query.filter_by(user_id=member.id)
+        .options(joinedload(Recommendation.book))
+        .order_by(Recommendation.rank)
+        .limit(4)
+    ]
+    if not suggested_books:
+        # Nothing built for this member yet (new account, or no history): newest arrivals.
+        suggested_books = Book.query.order_by(Book.created_at.desc()).limit(4).all()
 
     return render_template(
         "member/dashboard.html",
@@ -311,25 +646,85 @@ def portfolio():
     )
 
 
+def render_catalog(template: str, with_leaderboards: bool = False) -> str:
+    """The filterable, paginated catalog grid shared by the librarian and member views."""
+    category_id = request.args.get("category", type=int)
+    query = Book.query.options(joinedload(Book.category))
+    if category_id:
+        query = query.filter_by(category_id=category_id)
+    page = paginate(query, Book)
+    extra = {}
+    if with_leaderboards:
+        period = request.args.get("period", "30d")
+        if period not in leaderboards.PERIODS:
+            period = "30d"
+        extra = {
+            "period": period,
+            "periods": leaderboards.PERIOD_LABELS,
+            "popular": {metric: leaderboards.top(metric, period, category_id) for metric in leaderboards.METRICS},
+        }
+    return render_template(
+        template,
+        books=page.items,
+        page=page,
+        categories=Category.query.all(),
+        selected_category=category_id,
+        **extra,
+    )
+
+
 @bp.route("/books")
 def books():
     redirect_response = require_role("librarian")
     if redirect_response:
         return redirect_response
 
-    category_id = request.args.get("category", type=int)
-    categories = Category.query.all()
+    catalog = fragments.catalog_fragment(lambda: render_catalog("books/_catalog.html"))
+    return render_template("books/list.html", catalog=catalog)
 
-    if category_id:
-        book_list = Book.query.filter_by(category_id=category_id).all()
-    else:
-        book_list = Book.query.all()
 
+def render_availability(book_id: int, back_url: str):
+    book = Book.query.get_or_404(book_id)
+    try:
+        start = date.fromisoformat(request.args.get("start", ""))
+    except ValueError:
+        start = date.today()
+    days = min(max(request.args.get("days", 28, type=int), 1), 120)
+    return render_template(
+        "books/availability.html",
+        book=book,
+        days=availability.calendar(book, start, days),
+        span=days,
+        earlier=start - timedelta(days=days),
+        later=start + timedelta(days=days),
+        back_url=back_url,
+    )
+
+
+@bp.route("/books/<int:book_id>/availability")
+def book_availability(book_id: int):
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    return render_availability(book_id, url_for("library.books"))
+
+
+@bp.route("/books/search")
+def search_books():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    query = request.args.get("q", "").strip()
+    results = search.search_books(query, limit=PAGE_SIZE)
     return render_template(
         "books/list.html",
-        books=book_list,
-        categories=categories,
-        selected_category=category_id,
+        books=results,
+        page=Page(results, None),
+        categories=Category.query.all(),
+        selected_category=None,
+        search_query=query,
     )
 
 
@@ -353,6 +748,9 @@ def create_book():
         )
         db.session.add(book)
         db.session.commit()
+        invalidate_dashboard()
+        fragments.bump_catalog()
+        search.book_changed(book)
         flash("Book created successfully", "success")
         return redirect(url_for("library.books"))
 
@@ -376,7 +774,11 @@ def edit_book(book_id: int):
         book.category_id = get_form_value("category_id", int)
         book.copies_total = get_form_value("copies_total", int)
         book.copies_available = get_form_value("copies_available", int)
+        leaderboards.move_book(book.id, book.category_id)
         db.session.commit()
+        invalidate_dashboard()
+        fragments.bump_catalog()
+        search.book_changed(book)
         flash("Book updated successfully", "success")
         return redirect(url_for("library.books"))
 
@@ -392,6 +794,9 @@ def delete_book(book_id: int):
     book = Book.query.get_or_404(book_id)
     db.session.delete(book)
     db.session.commit()
+    invalidate_dashboard()
+    fragments.bump_catalog()
+    search.book_removed(book_id)
     flash("Book deleted", "info")
     return redirect(url_for("library.books"))
 
@@ -402,7 +807,15 @@ def users():
     if redirect_response:
         return redirect_response
 
-    return render_template("users/list.html", users=User.query.all())
+    page = paginate(User.query, User)
+    user_ids = [user.id for user in page.items]
+    return render_template(
+        "users/list.html",
+        users=page.items,
+        page=page,
+        booking_counts=count_by(Booking.user_id, user_ids),
+        rating_counts=count_by(Rating.user_id, user_ids),
+    )
 
 
 @bp.route("/users/create", methods=["GET", "POST"])
@@ -426,6 +839,7 @@ def create_user():
         user.set_password(password)
         db.session.add(user)
         db.session.commit()
+        invalidate_dashboard()
         flash("User created", "success")
         return redirect(url_for("library.users"))
 
@@ -439,8 +853,12 @@ def delete_user(user_id: int):
         return redirect_response
 
     user = User.query.get_or_404(user_id)
+    release_user_ratings(user)
     db.session.delete(user)
     db.session.commit()
+    invalidate_dashboard()
+    fragments.bump_catalog()
+    forget_access(user_id)
     flash("User deleted", "info")
     return redirect(url_for("library.users"))
 
@@ -462,18 +880,82 @@ def approve_user(user_id: int):
 
     user.approved = True
     db.session.commit()
+    invalidate_dashboard()
+    forget_access(user_id)
     flash(f"{user.name} approved.", "success")
     return redirect(url_for("library.users"))
 
 
+def selected_ids() -> list[int]:
+    """Ids ticked in a bulk form, deduplicated and in submission order."""
+    ids = []
+    for value in request.form.getlist("ids"):
+        try:
+            ids.append(int(value))
+        except ValueError:
+            continue
+    return list(dict.fromkeys(ids))
+
+
+def flash_bulk_outcome(verb: str, done: list[int], failed: dict[int, str], noun: str) -> None:
+    if done:
+        flash(f"{len(done)} {noun}(s) {verb}.", "success")
+    if failed:
+        shown = ", ".join(f"#{item_id}: {reason}" for item_id, reason in list(failed.items())[:10])
+        more = f" and {len(failed) - 10} more" if len(failed) > 10 else ""
+        flash(f"{len(failed)} {noun}(s) not {verb} ({shown}{more}).", "warning")
+    if not done and not failed:
+        flash(f"Select at least one {noun}.", "info")
+
+
+@bp.route("/users/approve", methods=["POST"])
+def approve_users():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    user_ids = selected_ids()
+    failed: dict[int, str] = {}
+    done: list[int] = []
+    if user_ids:
+        found = db.session.execute(
+            select(User.id, User.role, User.approved).where(User.id.in_(user_ids))
+        ).all()
+        pending = []
+        for row in found:
+            if row.role != "member":
+                failed[row.id] = "not a member account"
+            elif row.approved:
+                failed[row.id] = "already approved"
+            else:
+                pending.append(row.id)
+        found_ids = {row.id for row in found}
+        failed.update({user_id: "not found" for user_id in user_ids if user_id not in found_ids})
+        if pending:
+            db.session.execute(
+                update(User)
+                .where(User.id.in_(pending), User.role == "member", User.approved.is_not(True))
+                .values(approved=True)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            invalidate_dashboard()
+            for user_id in pending:
+                forget_access(user_id)
+        done = pending
+    flash_bulk_outcome("approved", done, failed, "user")
+    return redirect(url_for("library.users"))
+
+
 @bp.route("/bookings")
 def bookings():
     redirect_response = require_role("librarian")
     if redirect_response:
         return redirect_response
 
-    bookings_list = Booking.query.order_by(Booking.start_date.desc()).all()
-    return render_template("bookings/list.html", bookings=bookings_list)
+    query = Booking.query.options(joinedload(Booking.book), joinedload(Booking.user))
+    page = paginate(query, Booking, Booking.start_date, descending=True)
+    return render_template("bookings/list.html", bookings=page.items, page=page)
 
 
 @bp.route("/bookings/create", methods=["GET", "POST"])
@@ -498,19 +980,18 @@ def create_booking():
             flash("Select an approved member account.", "warning")
             return redirect(url_for("library.create_booking"))
 
-        booking = Booking(
+        booking = inventory.create_approved_booking(
             user_id=user_id,
             book_id=book_id,
             start_date=get_form_value("start_date", lambda v: date.fromisoformat(v)),
             end_date=get_form_value("end_date", lambda v: date.fromisoformat(v)),
-            approved=True,
-            return_requested=False,
-            returned=False,
-            fine_amount=0,
         )
-        book.copies_available -= 1
-        db.session.add(booking)
-        db.session.commit()
+        if booking is None:
+            # Someone else took the last copy after the check above.
+            flash("No copies available for that book.", "warning")
+            return redirect(url_for("library.create_booking"))
+        invalidate_dashboard()
+        fragments.bump_catalog()
         flash("Booking created", "success")
         return redirect(url_for("library.bookings"))
 
@@ -524,17 +1005,13 @@ def return_booking(booking_id: int):
         return redirect_response
 
     booking = Booking.query.get_or_404(booking_id)
-    if booking.approved and (booking.return_requested or not booking.returned):
-        booking.returned = True
-        booking.return_requested = False
-        booking.returned_at = date.today()
-        days_overdue = max((booking.returned_at - booking.end_date).days, 0)
-        booking.fine_amount = days_overdue * 100
-        booking.book.copies_available += 1
-        db.session.commit()
-        if booking.fine_amount:
-            flash(f"Return confirmed. Fine: Rs {booking.fine_amount}.", "warning")
-        else:
+    if booking.approved and not booking.returned:
+        fine = inventory.return_booking(booking.id, booking.book_id, booking.end_date)
+        invalidate_dashboard()
+        fragments.bump_catalog()
+        if fine:
+            flash(f"Return confirmed. Fine: Rs {fine}.", "warning")
+        elif fine is not None:
             flash("Return confirmed.", "success")
     return redirect(url_for("library.bookings"))
 
@@ -550,14 +1027,45 @@ def approve_booking(booking_id: int):
         flash("Booking already approved.", "info")
         return redirect(url_for("library.bookings"))
 
-    if booking.book.copies_available < 1:
+    outcome = inventory.approve_booking(booking.id, booking.book_id)
+    if outcome == "already_approved":
+        flash("Booking already approved.", "info")
+    elif outcome == "unavailable":
         flash("No copies available to approve this booking.", "warning")
-        return redirect(url_for("library.bookings"))
+    else:
+        invalidate_dashboard()
+        fragments.bump_catalog()
+        flash("Booking approved.", "success")
+    return redirect(url_for("library.bookings"))
 
-    booking.approved = True
-    booking.book.copies_available -= 1
-    db.session.commit()
-    flash("Booking approved.", "success")
+
+@bp.route("/bookings/approve", methods=["POST"])
+def approve_bookings():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    booking_ids = selected_ids()
+    done, failed = inventory.approve_bookings(booking_ids) if booking_ids else ([], {})
+    if done:
+        invalidate_dashboard()
+        fragments.bump_catalog()
+    flash_bulk_outcome("approved", done, failed, "booking")
+    return redirect(url_for("library.bookings"))
+
+
+@bp.route("/bookings/return", methods=["POST"])
+def return_bookings():
+    redirect_response = require_role("librarian")
+    if redirect_response:
+        return redirect_response
+
+    booking_ids = selected_ids()
+    done, failed = inventory.return_bookings(booking_ids) if booking_ids else ([], {})
+    if done:
+        invalidate_dashboard()
+        fragments.bump_catalog()
+    flash_bulk_outcome("returned", done, failed, "booking")
     return redirect(url_for("library.bookings"))
 
 
@@ -567,8 +1075,9 @@ def ratings():
     if redirect_response:
         return redirect_response
 
-    rating_list = Rating.query.order_by(Rating.created_at.desc()).all()
-    return render_template("ratings/list.html", ratings=rating_list)
+    query = Rating.query.options(joinedload(Rating.book), joinedload(Rating.user))
+    page = paginate(query, Rating, Rating.created_at, descending=True)
+    return render_template("ratings/list.html", ratings=page.items, page=page)
 
 
 @bp.route("/ratings/create", methods=["GET", "POST"])
@@ -580,14 +1089,19 @@ def create_rating():
     users = User.query.all()
     books = Book.query.all()
     if request.method == "POST":
+        book = Book.query.get_or_404(get_form_value("book_id", int))
         rating = Rating(
             user_id=get_form_value("user_id", int),
-            book_id=get_form_value("book_id", int),
+            book_id=book.id,
             score=get_form_value("score", int),
             comment=get_form_value("comment"),
         )
         db.session.add(rating)
+        book.record_rating(rating.score)
+        leaderboards.record_rating(book.id, rating.score)
         db.session.commit()
+        invalidate_dashboard()
+        fragments.bump_catalog()
         flash("Rating submitted", "success")
         return redirect(url_for("library.ratings"))
 
@@ -600,19 +1114,25 @@ def member_books():
     if redirect_response:
         return redirect_response
 
-    category_id = request.args.get("category", type=int)
-    categories = Category.query.all()
+    catalog = fragments.catalog_fragment(lambda: render_catalog("member/_catalog.html", with_leaderboards=True))
+    return render_template("member/books.html", catalog=catalog)
 
-    if category_id:
-        book_list = Book.query.filter_by(category_id=category_id).all()
-    else:
-        book_list = Book.query.all()
 
+@bp.route("/member/books/search")
+def member_search_books():
+    redirect_response = require_role("member")
+    if redirect_response:
+        return redirect_response
+
+    query = request.args.get("q", "").strip()
+    results = search.search_books(query, limit=PAGE_SIZE)
     return render_template(
         "member/books.html",
-        books=book_list,
-        categories=categories,
-        selected_category=category_id,
+        books=results,
+        page=Page(results, None),
+        categories=Category.query.all(),
+        selected_category=None,
+        search_query=query,
     )
 
 
@@ -631,6 +1151,15 @@ def member_book_reviews(book_id: int):
     return render_template("member/book_reviews.html", book=book, ratings=ratings)
 
 
+@bp.route("/member/books/<int:book_id>/availability")
+def member_book_availability(book_id: int):
+    redirect_response = require_role("member")
+    if redirect_response:
+        return redirect_response
+
+    return render_availability(book_id, url_for("library.member_books"))
+
+
 @bp.route("/member/bookings")
 def member_bookings():
     redirect_response = require_role("member")
@@ -638,8 +1167,78 @@ def member_bookings():
         return redirect_response
 
     member = current_member()
-    bookings_list = Booking.query.filter_by(user_id=member.id).order_by(Booking.start_date.desc()).all()
-    return render_template("member/bookings.html", bookings=bookings_list, member=member)
+    query = Booking.query.filter_by(user_id=member.id).options(joinedload(Booking.book))
+    page = paginate(query, Booking, Booking.start_date, descending=True)
+    return render_template(
+        "member/bookings.html",
+        bookings=page.items,
+        page=page,
+        member=member,
+        holds=member_holds(member.id),
+    )
+
+
+def member_holds(user_id: int) -> list:
+    """The member's holds with their 1-based place in each book's queue."""
+    ahead = aliased(Hold)
+    position = (
+        select(func.count())
+        .where(ahead.book_id == Hold.book_id, ahead.id <= Hold.id)
+        .correlate(Hold)
+        .scalar_subquery()
+    )
+    return (
+        db.session.query(Hold, position)
+        .filter(Hold.user_id == user_id)
+        .options(joinedload(Hold.book))
+        .order_by(Hold.id)
+        .all()
+    )
+
+
+@bp.route("/member/books/<int:book_id>/hold", methods=["POST"])
+def member_place_hold(book_id: int):
+    redirect_response = require_role("member")
+    if redirect_response:
+        return redirect_response
+
+    member = current_member()
+    book = Book.query.get_or_404(book_id)
+    if book.copies_available > 0:
+        flash("A copy is free right now, so you can book it directly.", "info")
+        return redirect(url_for("library.member_create_booking", book_id=book.id))
+
+    db.session.add(Hold(book_id=book.id, user_id=member.id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        flash("You are already on the waitlist for this book.", "info")
+        return redirect(url_for("library.member_bookings"))
+    flash(
+        f"You're on the waitlist for {book.title}. "
+        "When a copy comes back it is lent to you automatically.",
+        "success",
+    )
+    return redirect(url_for("library.member_bookings"))
+
+
+@bp.route("/member/holds/<int:hold_id>/cancel", methods=["POST"])
+def member_cancel_hold(hold_id: int):
+    redirect_response = require_role("member")
+    if redirect_response:
+        return redirect_response
+
+    member = current_member()
+    hold = Hold.query.get_or_404(hold_id)
+    if hold.user_id != member.id:
+        flash("That hold does not belong to you.", "danger")
+        return redirect(url_for("library.member_bookings"))
+
+    db.session.delete(hold)
+    db.session.commit()
+    flash("You left the waitlist.", "info")
+    return redirect(url_for("library.member_bookings"))
 
 
 @bp.route("/member/bookings/new", methods=["GET", "POST"])
@@ -667,8 +1266,9 @@ def member_create_booking():
             flash("Selected book was not found.", "danger")
             return redirect(url_for("library.member_create_booking"))
 
+        # Approval takes a copy off the shelf (inventory.reserve_copy), so a request needs one there now.
         if book.copies_available < 1:
-            flash("No copies available right now. Please pick another title.", "warning")
+            flash("No copies available right now. Join the waitlist to get the next one back.", "warning")
             return redirect(url_for("library.member_create_booking", book_id=book_id))
 
         try:
@@ -696,7 +1296,10 @@ def member_create_booking():
             fine_amount=0,
         )
         db.session.add(booking)
+        db.session.flush()
+        events.record(events.REQUESTED, booking.id, booking.book_id)
         db.session.commit()
+        invalidate_dashboard()
         flash("Booking request submitted. A librarian must approve it.", "success")
         return redirect(url_for("library.member_bookings"))
 
@@ -732,7 +1335,9 @@ def member_return_booking(booking_id: int):
 
     if not booking.returned:
         booking.return_requested = True
+        events.record(events.RETURN_REQUESTED, booking.id, booking.book_id)
         db.session.commit()
+        invalidate_dashboard()
         flash("Return requested. A librarian must confirm it.", "success")
 
     return redirect(url_for("library.member_bookings"))
@@ -745,12 +1350,9 @@ def member_ratings():
         return redirect_response
 
     member = current_member()
-    rating_list = (
-        Rating.query.filter_by(user_id=member.id)
-        .order_by(Rating.created_at.desc())
-        .all()
-    )
-    return render_template("member/ratings.html", ratings=rating_list, member=member)
+    query = Rating.query.filter_by(user_id=member.id).options(joinedload(Rating.book))
+    page = paginate(query, Rating, Rating.created_at, descending=True)
+    return render_template("member/ratings.html", ratings=page.items, page=page, member=member)
 
 
 @bp.route("/member/ratings/new", methods=["GET", "POST"])
@@ -764,14 +1366,19 @@ def member_create_rating():
     selected_book_id = request.args.get("book_id", type=int)
 
     if request.method == "POST":
+        book = Book.query.get_or_404(get_form_value("book_id", int))
         rating = Rating(
             user_id=member.id,
-            book_id=get_form_value("book_id", int),
+            book_id=book.id,
             score=get_form_value("score", int),
             comment=get_form_value("comment"),
         )
         db.session.add(rating)
+        book.record_rating(rating.score)
+        leaderboards.record_rating(book.id, rating.score)
         db.session.commit()
+        invalidate_dashboard()
+        fragments.bump_catalog()
         flash("Thanks for rating!", "success")
         return redirect(url_for("library.member_ratings"))
 
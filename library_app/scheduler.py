@@ -0,0 +1,34 @@
+"""In-process periodic jobs for deployments without cron.
+
+Each job runs in its own daemon thread inside an app context. A failed run
+is rolled back and logged, and the next tick tries again. Every worker that
+enables a job runs its own copy, so jobs started this way must be safe to
+repeat.
+"""
+import threading
+from typing import Callable
+
+from flask import Flask
+
+from . import db
+
+
+def start_periodic(app: Flask, name: str, interval: float, job: Callable[[], object]) -> threading.Thread | None:
+    """Run ``job`` every ``interval`` seconds; returns None when ``interval`` is 0."""
+    if not interval:
+        return None
+    stop = threading.Event()
+
+    def loop() -> None:
+        while not stop.wait(interval):
+            with app.app_context():
+                try:
+                    job()
+                except Exception:  # noqa: BLE001 - keep the scheduler alive; log and retry next tick
+                    db.session.rollback()
+                    app.logger.exception("Scheduled job %s failed", name)
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    app.extensions[name.replace("-", "_")] = stop
+    return thread
@@ -0,0 +1,227 @@
+"""Catalog full-text search.
+
+SQLite databases get an FTS5 table (``books_fts``) that triggers keep in step
+with ``books``. Any other backend, or a SQLite build without FTS5, falls back
+to an in-process inverted index that is built on first use and then patched
+as books are created, edited or deleted.
+
+Each worker process holds its own fallback index, so before every search it
+compares the index with ``COUNT(*)`` and ``MAX(updated_at)`` over ``books``
+and re-reads only the rows that changed since the last sync, which picks up
+writes made by other workers. Two limits remain. A write stamped with an
+``updated_at`` older than the last sync (clock skew between hosts) is missed
+until that book changes again. Each search pays one aggregate query.
+"""
+import bisect
+import re
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .models import Book
+
+# Column weights used for ranking: an ISBN or title hit beats one buried in the description.
+FIELD_WEIGHTS = {"isbn": 20.0, "title": 10.0, "author": 5.0, "description": 1.0}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, isbn, description,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, isbn, description)
+        VALUES (new.id, new.title, new.author, new.isbn, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, isbn, description)
+        VALUES ('delete', old.id, old.title, old.author, old.isbn, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, isbn, description ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, isbn, description)
+        VALUES ('delete', old.id, old.title, old.author, old.isbn, old.description);
+        INSERT INTO books_fts(rowid, title, author, isbn, description)
+        VALUES (new.id, new.title, new.author, new.isbn, new.description);
+    END
+    """,
+]
+
+
+def tokenize(value: str | None) -> list[str]:
+    if not value:
+        return []
+    return _TOKEN_RE.findall(value.casefold())
+
+
+def install_fts() -> bool:
+    """Create the FTS5 table and triggers if needed; return whether FTS5 is in use."""
+    engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return False
+    try:
+        existed = _has_fts_table(engine)
+        with engine.begin() as connection:
+            for statement in FTS_SCHEMA:
+                connection.execute(text(statement))
+            if not existed:
+                # Index whatever rows were there before the triggers existed.
+                connection.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+    except OperationalError:
+        # SQLite compiled without FTS5.
+        return False
+    _state()["fts"] = True
+    return True
+
+
+def _state() -> dict:
+    state = current_app.extensions.get("catalog_search")
+    if state is None:
+        state = {"fts": None, "index": None, "synced": None}
+        current_app.extensions["catalog_search"] = state
+    return state
+
+
+def uses_fts() -> bool:
+    state = _state()
+    if state["fts"] is None:
+        engine = db.engine
+        state["fts"] = engine.dialect.name == "sqlite" and _has_fts_table(engine)
+    return state["fts"]
+
+
+def _has_fts_table(engine) -> bool:
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'books_fts'")
+        ).first() is not None
+
+
+class InvertedIndex:
+    """Token -> {book_id: weight} postings with a sorted vocabulary for prefix lookups."""
+
+    def __init__(self) -> None:
+        self.postings: dict[str, dict[int, float]] = defaultdict(dict)
+        self.vocabulary: list[str] = []
+        self.book_tokens: dict[int, set[str]] = {}
+
+    def add(self, book: Book) -> None:
+        self.remove(book.id)
+        weights: dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(getattr(book, field)):
+                weights[token] = max(weights.get(token, 0.0), weight)
+        for token, weight in weights.items():
+            if token not in self.postings:
+                bisect.insort(self.vocabulary, token)
+            self.postings[token][book.id] = weight
+        self.book_tokens[book.id] = set(weights)
+
+    def remove(self, book_id: int) -> None:
+        # Emptied tokens stay in the vocabulary; they simply contribute no postings.
+        for token in self.book_tokens.pop(book_id, ()):
+            self.postings[token].pop(book_id, None)
+
+    def _prefix_scores(self, prefix: str) -> dict[int, float]:
+        scores: dict[int, float] = {}
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            # Exact-word matches rank above pure prefix matches.
+            bonus = 1.0 if token == prefix else 0.5
+            for book_id, weight in self.postings[token].items():
+                scores[book_id] = max(scores.get(book_id, 0.0), weight * bonus)
+        return scores
+
+    def search(self, terms: list[str], limit: int) -> list[int]:
+        per_term = sorted((self._prefix_scores(term) for term in terms), key=len)
+        if not per_term or not per_term[0]:
+            return []
+        totals = dict(per_term[0])
+        for scores in per_term[1:]:
+            totals = {book_id: total + scores[book_id] for book_id, total in totals.items() if book_id in scores}
+            if not totals:
+                return []
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return [book_id for book_id, _ in ranked[:limit]]
+
+
+def _fallback_index() -> InvertedIndex:
+    """The process's index, first brought up to date with writes from any worker."""
+    state = _state()
+    count, latest = db.session.execute(select(func.count(Book.id), func.max(Book.updated_at))).one()
+    index = state["index"]
+    if index is None:
+        index = InvertedIndex()
+        changed = Book.query
+    elif state["synced"] != (count, latest):
+        # ">=" re-reads rows stamped in the same instant as the last sync.
+        changed = Book.query.filter(Book.updated_at >= state["synced"][1]) if state["synced"][1] else Book.query
+    else:
+        return index
+    for book in changed.yield_per(1000):
+        index.add(book)
+    if len(index.book_tokens) != count:
+        # Rows deleted elsewhere: drop whatever the table no longer has.
+        for book_id in set(index.book_tokens) - set(db.session.scalars(select(Book.id))):
+            index.remove(book_id)
+    state["index"], state["synced"] = index, (count, latest)
+    return index
+
+
+def reset_index() -> None:
+    """Drop the fallback index after bulk writes; it is rebuilt on the next search."""
+    _state()["index"] = None
+
+
+def book_changed(book: Book) -> None:
+    """Refresh a book in the fallback index after its row was written (FTS5 uses triggers)."""
+    state = _state()
+    if not uses_fts() and state["index"] is not None:
+        state["index"].add(book)
+
+
+def book_removed(book_id: int) -> None:
+    state = _state()
+    if not uses_fts() and state["index"] is not None:
+        state["index"].remove(book_id)
+
+
+def search_books(query: str, limit: int = 50) -> list[Book]:
+    """Ranked prefix search over title, author, ISBN and description."""
+    terms = tokenize(query)
+    if not terms:
+        return []
+
+    if uses_fts():
+        match = " ".join(f'"{term}"*' for term in terms)
+        weights = ", ".join(str(FIELD_WEIGHTS[field]) for field in ("title", "author", "isbn", "description"))
+        rows = db.session.execute(
+            text(
+                f"SELECT rowid FROM books_fts WHERE books_fts MATCH :match "
+                f"ORDER BY bm25(books_fts, {weights}) LIMIT :limit"
+            ),
+            {"match": match, "limit": limit},
+        )
+        book_ids = [row[0] for row in rows]
+    else:
+        book_ids = _fallback_index().search(terms, limit)
+
+    if not book_ids:
+        return []
+    matches = Book.query.options(joinedload(Book.category)).filter(Book.id.in_(book_ids))
+    books_by_id = {book.id: book for book in matches}
+    return [books_by_id[book_id] for book_id in book_ids if book_id in books_by_id]
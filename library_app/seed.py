@@ -1,8 +1,19 @@
-from datetime import date, timedelta
+import random
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, insert, update
 
 from . import db
+from .inventory import fine_for
 from .models import Book, Booking, Category, Rating, User
 
+SCALE_CATEGORIES = [
+    "Fiction", "Science", "History", "Biography", "Poetry", "Philosophy",
+    "Technology", "Mathematics", "Art", "Travel", "Children", "Mystery",
+]
+SCALE_BATCH = 10_000
+
 
 def _ensure_category(name: str) -> Category:
     category = Category.query.filter_by(name=name).first()
@@ -130,10 +141,198 @@ def seed_database() -> None:
 
     if not Rating.query.filter_by(user_id=alice.id, book_id=clean_code.id).first():
         db.session.add(Rating(user=alice, book=clean_code, score=5, comment="Great reference!"))
+        clean_code.record_rating(5)
     if not Rating.query.filter_by(user_id=bob.id, book_id=nineteen_eighty_four.id).first():
         db.session.add(Rating(user=bob, book=nineteen_eighty_four, score=4, comment="A classic."))
+        nineteen_eighty_four.record_rating(4)
     if not Rating.query.filter_by(user_id=carol.id, book_id=sapiens.id).first():
         db.session.add(Rating(user=carol, book=sapiens, score=5, comment="Eye opening."))
+        sapiens.record_rating(5)
 
     db.session.commit()
     print("Seed data inserted or refreshed.")
+
+
+def _insert_batches(model, rows) -> None:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= SCALE_BATCH:
+            db.session.connection().execute(insert(model.__table__), batch)
+            batch = []
+    if batch:
+        db.session.connection().execute(insert(model.__table__), batch)
+
+
+def _next_id(model) -> int:
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _skewed_picker(rng: random.Random, first_id: int, count: int, exponent: float):
+    """Draw ids with a Zipf-like skew: a few popular titles/members, a long tail."""
+    cumulative = list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(count)))
+    ids = range(first_id, first_id + count)
+    return lambda k: rng.choices(ids, cum_weights=cumulative, k=k)
+
+
+def seed_scale(scale: int, seed: int = 0) -> dict[str, int]:
+    """Bulk-generate a realistic library of ``scale`` books.
+
+    Produces ``scale // 5`` members, about three bookings per book (returned,
+    returned late with fines, open, overdue, pending, return requested) and
+    about two ratings per book, with Zipf-skewed popularity. Counters on
+    ``books`` (copies_available, rating_count, rating_sum) are kept consistent
+    with the generated rows.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.utcnow()
+
+    existing = dict(db.session.query(Category.name, Category.id))
+    for name in SCALE_CATEGORIES:
+        if name not in existing:
+            category = Category(name=name)
+            db.session.add(category)
+            db.session.flush()
+            existing[name] = category.id
+    category_ids = [existing[name] for name in SCALE_CATEGORIES]
+
+    # One hash shared by every synthetic member; hashing per user would dominate the run.
+    template = User(name="", email="", role="member")
+    template.set_password("password123")
+    member_count = max(scale // 5, 1)
+    first_user = _next_id(User)
+    _insert_batches(
+        User,
+        (
+            {
+                "id": first_user + n,
+                "name": f"Member {first_user + n}",
+                "email": f"member{first_user + n}@scale.example.com",
+                "password_hash": template.password_hash,
+                "role": "member",
+                "approved": rng.random() > 0.02,
+                "created_at": now - timedelta(days=rng.randint(0, 730)),
+                "updated_at": now,
+            }
+            for n in range(member_count)
+        ),
+    )
+
+    first_book = _next_id(Book)
+    copies_total = [rng.choice((1, 1, 2, 2, 3, 4, 5, 8)) for _ in range(scale)]
+    _insert_batches(
+        Book,
+        (
+            {
+                "id": first_book + n,
+                "title": f"Volume {first_book + n}",
+                "author": f"Author {rng.randint(1, max(scale // 8, 1))}",
+                "isbn": f"scale-{seed}-{first_book + n}",
+                "description": f"Synthetic catalog entry {first_book + n}.",
+                "category_id": rng.choice(category_ids),
+                "copies_total": copies_total[n],
+                "copies_available": copies_total[n],
+                "rating_count": 0,
+                "rating_sum": 0,
+                "created_at": now - timedelta(days=rng.randint(0, 1500)),
+                "updated_at": now,
+            }
+            for n in range(scale)
+        ),
+    )
+
+    pick_book = _skewed_picker(rng, first_book, scale, exponent=0.9)
+    pick_member = _skewed_picker(rng, first_user, member_count, exponent=0.6)
+    open_loans = [0] * scale
+    rating_count = [0] * scale
+    rating_sum = [0] * scale
+
+    def bookings():
+        total = scale * 3
+        for book_id, user_id in zip(pick_book(total), pick_member(total)):
+            slot = book_id - first_book
+            start = today - timedelta(days=rng.randint(-14, 365))
+            end = start + timedelta(days=rng.choice((7, 14, 14, 21)))
+            row = {
+                "user_id": user_id,
+                "book_id": book_id,
+                "start_date": start,
+                "end_date": end,
+                "approved": True,
+                "returned": False,
+                "return_requested": False,
+                "returned_at": None,
+                "fine_amount": 0,
+                "created_at": now,
+                "updated_at": now,
+            }
+            roll = rng.random()
+            if start > today or roll < 0.05:
+                row["approved"] = False
+            elif (end < today and roll < 0.9) or open_loans[slot] >= copies_total[slot]:
+                # Mostly on time, with a tail of late returns that picked up fines.
+                late = rng.random() < 0.15
+                returned_at = min(end + timedelta(days=rng.randint(1, 30) if late else -rng.randint(0, 3)), today)
+                row.update(returned=True, returned_at=returned_at, fine_amount=fine_for(end, returned_at))
+            else:
+                open_loans[slot] += 1
+                row["return_requested"] = rng.random() < 0.1
+            yield row
+
+    def ratings():
+        seen = set()
+        for book_id, user_id in zip(pick_book(scale * 2), pick_member(scale * 2)):
+            if (user_id, book_id) in seen:
+                continue
+            seen.add((user_id, book_id))
+            score = rng.choices((1, 2, 3, 4, 5), weights=(4, 6, 18, 38, 34))[0]
+            rating_count[book_id - first_book] += 1
+            rating_sum[book_id - first_book] += score
+            yield {
+                "user_id": user_id,
+                "book_id": book_id,
+                "score": score,
+                "comment": None,
+                "created_at": now - timedelta(minutes=rng.randint(0, 525_600)),
+                "updated_at": now,
+            }
+
+    _insert_batches(Booking, bookings())
+    _insert_batches(Rating, ratings())
+
+    touched = (
+        {
+            "b_id": first_book + slot,
+            "available": copies_total[slot] - open_loans[slot],
+            "count": rating_count[slot],
+            "total": rating_sum[slot],
+        }
+        for slot in range(scale)
+        if open_loans[slot] or rating_count[slot]
+    )
+    stmt = (
+        update(Book.__table__)
+        .where(Book.__table__.c.id == db.bindparam("b_id"))
+        .values(
+            copies_available=db.bindparam("available"),
+            rating_count=db.bindparam("count"),
+            rating_sum=db.bindparam("total"),
+        )
+    )
+    batch = []
+    for row in touched:
+        batch.append(row)
+        if len(batch) >= SCALE_BATCH:
+            db.session.connection().execute(stmt, batch)
+            batch = []
+    if batch:
+        db.session.connection().execute(stmt, batch)
+
+    db.session.commit()
+    return {
+        "members": member_count,
+        "books": scale,
+        "bookings": db.session.query(func.count(Booking.id)).scalar(),
+        "ratings": db.session.query(func.count(Rating.id)).scalar(),
+    }
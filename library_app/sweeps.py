@@ -0,0 +1,53 @@
+"""Overdue sweep: accrue fines on open loans in one set-based UPDATE.
+
+``return_booking`` settles the final fine when a book comes back; the sweep
+keeps ``fine_amount`` on still-open overdue loans current in between, so
+members and librarians see what is owed before the return. Each run also
+appends an ``OverdueSummary`` row for the dashboards.
+"""
+import threading
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import func, literal, update
+
+from . import db
+from .inventory import FINE_PER_DAY, days_between
+from .models import Booking, OverdueSummary
+from .scheduler import start_periodic
+
+
+def sweep_overdue(today: date | None = None) -> OverdueSummary:
+    today = today or date.today()
+    overdue = (
+        Booking.approved.is_(True),
+        Booking.returned.is_not(True),
+        Booking.end_date < today,
+    )
+    accrued = days_between(literal(today, db.Date), Booking.end_date) * FINE_PER_DAY
+    db.session.execute(
+        update(Booking)
+        .where(*overdue, Booking.fine_amount.is_distinct_from(accrued))
+        .values(fine_amount=accrued)
+        .execution_options(synchronize_session=False)
+    )
+
+    loans, fines, members = db.session.execute(
+        db.select(
+            func.count(Booking.id),
+            func.coalesce(func.sum(Booking.fine_amount), 0),
+            func.count(Booking.user_id.distinct()),
+        ).where(*overdue)
+    ).one()
+    summary = OverdueSummary(as_of=today, overdue_loans=loans, outstanding_fines=fines, members_affected=members)
+    db.session.add(summary)
+    db.session.commit()
+    return summary
+
+
+def start_scheduler(app: Flask) -> threading.Thread | None:
+    """Run ``sweep_overdue`` every ``OVERDUE_SWEEP_INTERVAL`` seconds in a daemon thread.
+
+    The sweep is idempotent, so several workers running it just repeat the same UPDATE.
+    """
+    return start_periodic(app, "overdue-sweep", app.config.get("OVERDUE_SWEEP_INTERVAL", 0), sweep_overdue)
@@ -0,0 +1,69 @@
+"""Books FTS5 search index
+
+Revision ID: 3b7e0c2d9a41
+Revises: f9c9851afb4b
+Create Date: 2026-10-16 11:40:03.552817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e0c2d9a41'
+down_revision = 'f9c9851afb4b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only SQLite has FTS5; other backends use the in-process index in library_app.search.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, author, isbn, description,
+            content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, title, author, isbn, description)
+            VALUES (new.id, new.title, new.author, new.isbn, new.description);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, author, isbn, description)
+            VALUES ('delete', old.id, old.title, old.author, old.isbn, old.description);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, isbn, description ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, author, isbn, description)
+            VALUES ('delete', old.id, old.title, old.author, old.isbn, old.description);
+            INSERT INTO books_fts(rowid, title, author, isbn, description)
+            VALUES (new.id, new.title, new.author, new.isbn, new.description);
+        END
+        """
+    )
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS books_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_ai")
+    op.execute("DROP TABLE IF EXISTS books_fts")
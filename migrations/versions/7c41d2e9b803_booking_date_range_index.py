@@ -0,0 +1,28 @@
+"""Replace the bookings book_id index with (book_id, start_date, end_date)
+
+Revision ID: 7c41d2e9b803
+Revises: eeeae11bf8bd
+Create Date: 2026-10-16 23:05:12.318044
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c41d2e9b803'
+down_revision = 'eeeae11bf8bd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_book_start_end', ['book_id', 'start_date', 'end_date'], unique=False)
+        batch_op.drop_index('ix_bookings_book_id')
+
+
+def downgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_book_id', ['book_id'], unique=False)
+        batch_op.drop_index('ix_bookings_book_start_end')
@@ -0,0 +1,41 @@
+"""Waitlist holds per book
+
+Revision ID: a4f0c6b19e27
+Revises: 7c41d2e9b803
+Create Date: 2026-10-16 23:41:37.502911
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4f0c6b19e27'
+down_revision = '7c41d2e9b803'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'holds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('book_id', 'user_id', name='uq_holds_book_user'),
+    )
+    with op.batch_alter_table('holds', schema=None) as batch_op:
+        batch_op.create_index('ix_holds_book_id_id', ['book_id', 'id'], unique=False)
+        batch_op.create_index('ix_holds_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('holds', schema=None) as batch_op:
+        batch_op.drop_index('ix_holds_user_id')
+        batch_op.drop_index('ix_holds_book_id_id')
+
+    op.drop_table('holds')
@@ -0,0 +1,42 @@
+"""Precomputed member recommendations
+
+Revision ID: b81d5a2f4c37
+Revises: a4f0c6b19e27
+Create Date: 2026-10-16 09:12:48.163520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81d5a2f4c37'
+down_revision = 'a4f0c6b19e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'recommendations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.create_index('ix_recommendations_user_rank', ['user_id', 'rank'], unique=False)
+        batch_op.create_index('ix_recommendations_book_id', ['book_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.drop_index('ix_recommendations_book_id')
+        batch_op.drop_index('ix_recommendations_user_rank')
+
+    op.drop_table('recommendations')
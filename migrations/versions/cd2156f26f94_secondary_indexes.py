@@ -0,0 +1,58 @@
+"""Secondary indexes for dashboard and list queries
+
+Revision ID: cd2156f26f94
+Revises: 3b7e0c2d9a41
+Create Date: 2026-10-16 13:05:27.904611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cd2156f26f94'
+down_revision = '3b7e0c2d9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_role_approved', ['role', 'approved'], unique=False)
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_category_id', ['category_id'], unique=False)
+        batch_op.create_index('ix_books_created_at', ['created_at'], unique=False)
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_approved_returned_start', ['approved', 'returned', 'start_date'], unique=False)
+        batch_op.create_index('ix_bookings_user_returned_start', ['user_id', 'returned', 'start_date'], unique=False)
+        batch_op.create_index('ix_bookings_user_start', ['user_id', 'start_date'], unique=False)
+        batch_op.create_index('ix_bookings_book_id', ['book_id'], unique=False)
+        batch_op.create_index('ix_bookings_start_date', ['start_date'], unique=False)
+
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.create_index('ix_ratings_user_created', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_ratings_book_created', ['book_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_ratings_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ratings', schema=None) as batch_op:
+        batch_op.drop_index('ix_ratings_created_at')
+        batch_op.drop_index('ix_ratings_book_created')
+        batch_op.drop_index('ix_ratings_user_created')
+
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_start_date')
+        batch_op.drop_index('ix_bookings_book_id')
+        batch_op.drop_index('ix_bookings_user_start')
+        batch_op.drop_index('ix_bookings_user_returned_start')
+        batch_op.drop_index('ix_bookings_approved_returned_start')
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_created_at')
+        batch_op.drop_index('ix_books_category_id')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_role_approved')
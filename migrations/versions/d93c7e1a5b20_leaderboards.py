@@ -0,0 +1,72 @@
+"""Per-day book activity and materialised leaderboards
+
+Revision ID: d93c7e1a5b20
+Revises: b81d5a2f4c37
+Create Date: 2026-10-16 11:37:05.418926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93c7e1a5b20'
+down_revision = 'b81d5a2f4c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'book_activity',
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('borrows', sa.Integer(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+        sa.PrimaryKeyConstraint('book_id', 'day'),
+    )
+    with op.batch_alter_table('book_activity', schema=None) as batch_op:
+        batch_op.create_index('ix_book_activity_day', ['day'], unique=False)
+
+    op.create_table(
+        'leaderboard_entries',
+        sa.Column('period', sa.String(length=8), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('borrows', sa.Integer(), nullable=False),
+        sa.Column('rating_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.Column('rating_score', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+        sa.PrimaryKeyConstraint('period', 'book_id'),
+    )
+    with op.batch_alter_table('leaderboard_entries', schema=None) as batch_op:
+        batch_op.create_index('ix_leaderboard_period_borrows', ['period', 'borrows', 'book_id'], unique=False)
+        batch_op.create_index('ix_leaderboard_period_score', ['period', 'rating_score', 'book_id'], unique=False)
+        batch_op.create_index(
+            'ix_leaderboard_period_category_borrows', ['period', 'category_id', 'borrows', 'book_id'], unique=False
+        )
+        batch_op.create_index(
+            'ix_leaderboard_period_category_score', ['period', 'category_id', 'rating_score', 'book_id'], unique=False
+        )
+        batch_op.create_index('ix_leaderboard_book_id', ['book_id'], unique=False)
+
+    # Existing loans and ratings are folded in by `flask compact-leaderboards --rebuild`.
+
+
+def downgrade():
+    with op.batch_alter_table('leaderboard_entries', schema=None) as batch_op:
+        batch_op.drop_index('ix_leaderboard_book_id')
+        batch_op.drop_index('ix_leaderboard_period_category_score')
+        batch_op.drop_index('ix_leaderboard_period_category_borrows')
+        batch_op.drop_index('ix_leaderboard_period_score')
+        batch_op.drop_index('ix_leaderboard_period_borrows')
+
+    op.drop_table('leaderboard_entries')
+    with op.batch_alter_table('book_activity', schema=None) as batch_op:
+        batch_op.drop_index('ix_book_activity_day')
+
+    op.drop_table('book_activity')
@@ -0,0 +1,44 @@
+"""Append-only circulation event log
+
+Revision ID: e5f28b9c0d14
+Revises: d93c7e1a5b20
+Create Date: 2026-10-16 14:22:51.730164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f28b9c0d14'
+down_revision = 'd93c7e1a5b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'circulation_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('amount', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('circulation_events', schema=None) as batch_op:
+        batch_op.create_index('ix_circulation_events_booking_id', ['booking_id', 'id'], unique=False)
+        batch_op.create_index('ix_circulation_events_book_kind', ['book_id', 'kind'], unique=False)
+        batch_op.create_index('ix_circulation_events_created_at', ['created_at'], unique=False)
+
+    # Existing bookings are logged by `flask replay-events --backfill`.
+
+
+def downgrade():
+    with op.batch_alter_table('circulation_events', schema=None) as batch_op:
+        batch_op.drop_index('ix_circulation_events_created_at')
+        batch_op.drop_index('ix_circulation_events_book_kind')
+        batch_op.drop_index('ix_circulation_events_booking_id')
+
+    op.drop_table('circulation_events')
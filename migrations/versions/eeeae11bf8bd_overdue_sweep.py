@@ -0,0 +1,38 @@
+"""Overdue sweep summary table and index
+
+Revision ID: eeeae11bf8bd
+Revises: cd2156f26f94
+Create Date: 2026-10-16 15:22:48.671930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'eeeae11bf8bd'
+down_revision = 'cd2156f26f94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'overdue_summaries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('as_of', sa.Date(), nullable=False),
+        sa.Column('overdue_loans', sa.Integer(), nullable=False),
+        sa.Column('outstanding_fines', sa.Integer(), nullable=False),
+        sa.Column('members_affected', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.create_index('ix_bookings_approved_returned_end', ['approved', 'returned', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('bookings', schema=None) as batch_op:
+        batch_op.drop_index('ix_bookings_approved_returned_end')
+
+    op.drop_table('overdue_summaries')
@@ -0,0 +1,30 @@
+"""Expiry watermarks for the windowed leaderboards
+
+Revision ID: f6a1c3d8e2b7
+Revises: e5f28b9c0d14
+Create Date: 2026-10-16 23:12:44.203518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a1c3d8e2b7'
+down_revision = 'e5f28b9c0d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'leaderboard_windows',
+        sa.Column('period', sa.String(length=8), nullable=False),
+        sa.Column('expired_through', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint('period'),
+    )
+    # The first leaderboard write rebuilds the 7d/30d boards from book_activity and records the watermarks.
+
+
+def downgrade():
+    op.drop_table('leaderboard_windows')
@@ -0,0 +1,37 @@
+"""Book rating aggregates
+
+Revision ID: f9c9851afb4b
+Revises: 5e3434cd5cfa
+Create Date: 2026-10-16 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f9c9851afb4b'
+down_revision = '5e3434cd5cfa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the existing reviews in one set-based pass.
+    op.execute(
+        """
+        UPDATE books SET
+            rating_count = (SELECT COUNT(*) FROM ratings WHERE ratings.book_id = books.id),
+            rating_sum = (SELECT COALESCE(SUM(score), 0) FROM ratings WHERE ratings.book_id = books.id)
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('rating_count')